@@ -11,13 +11,31 @@ class AI(Sprite):
         self.position = None
 
 
-    def choose_position(self, cur_board, player_id, last_position, signal):
+    def search_service(self, requests, signal, cancel):
         '''
-        Use the MCTS to find a position
+        Answer the requests (board, player_id, last_position) with one MCTS kept alive between turns,
+        so the subtree of the last search is reused, and ponder on it while the opponent is thinking
+        The search is abandoned without answer once cancel is set, a None request ends the service
         Used for multiprocessing
         '''
-        print('Start:{}'.format(signal.get()))
-        mcts = MCTS(cur_board, Config.THINK_TIME, Config.SIMULATION_TIMES)
-        position = mcts.choose_position(player_id, last_position)
-        signal.put(Config.AI_THREAD_DONE)
-        signal.put(position)
\ No newline at end of file
+        mcts = None
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            cur_board, player_id, last_position = request
+            cancel.clear()
+            print('Start: player {}'.format(player_id))
+            if mcts is None:
+                mcts = MCTS(cur_board, Config.THINK_TIME, Config.SIMULATION_TIMES)
+                mcts.cancel = cancel
+            else:
+                mcts.update_board(cur_board)
+            position = mcts.choose_position(player_id, last_position)
+            if mcts.stop_reason == 'cancelled':
+                mcts.root = None
+                continue
+            signal.put(Config.AI_THREAD_DONE)
+            signal.put(position)
+            if Config.PONDER:
+                mcts.ponder(lambda: not requests.empty())
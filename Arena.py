@@ -0,0 +1,123 @@
+'''
+Headless AI-vs-AI arena
+
+python Arena.py --games 20 --workers 4 --think_time 2 2 --simulation_times 10000 10000 --output arena.jsonl
+'''
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+import Config
+from Board import new_board
+from MCTS import MCTS
+
+
+@contextlib.contextmanager
+def config_overrides(overrides):
+    '''
+    Set the Config values of a side during its move
+    '''
+    saved = {name: getattr(Config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+
+def play_game(game_id, board_size, n_in_row, sides, seed):
+    '''
+    Play one game between two sides without display
+    sides: [first side, second side], each {'name', 'think_time', 'simulation_times', 'config': {Config overrides}}
+    output: the result of the game with the timing of every move
+    '''
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    Config.set_board_size(board_size)
+    board = new_board(np.zeros((board_size, board_size)), n_in_row)
+    players = {Config.FIRST: sides[0], Config.SECOND: sides[1]}
+    searches = {}
+    moves = []
+    player, last_position = Config.FIRST, None
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while not board.is_over:
+            side = players[player]
+            with config_overrides(side.get('config', {})):
+                begin = time.time()
+                if player not in searches:
+                    searches[player] = MCTS(board, side['think_time'], side['simulation_times'])
+                else:
+                    searches[player].update_board(board)
+                mcts = searches[player]
+                position = mcts.choose_position(-1*player, last_position)
+                seconds = time.time() - begin
+            board.move(position, player)
+            moves.append({'player': player, 'position': [int(position[0]), int(position[1])], 'seconds': seconds, 
+                'simulations': int(mcts.simulation_times), 'stop_reason': mcts.stop_reason})
+            player, last_position = -1*player, position
+
+    winner = None if board.winner is None else players[board.winner]['name']
+    return {'game_id': game_id, 'board_size': board_size, 'n_in_row': n_in_row, 'first': sides[0]['name'], 
+        'second': sides[1]['name'], 'winner': winner, 'moves': moves}
+
+
+def run_tournament(games, board_size, n_in_row, sides, workers, output, seed=0):
+    '''
+    Play the games over a process pool, the two sides swap colors every game
+    Every game is written as one JSON line to output
+    output: a DataFrame with one row per game
+    '''
+    rng = random.Random(seed)
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output, 'w') as result_file:
+        futures = [executor.submit(play_game, game_id, board_size, n_in_row, 
+            sides if game_id % 2 == 0 else sides[::-1], rng.randrange(2**32)) for game_id in range(games)]
+        rows = []
+        for future in futures:
+            result = future.result()
+            result_file.write(json.dumps(result) + '\n')
+            seconds = [move['seconds'] for move in result['moves']]
+            simulations = [move['simulations'] for move in result['moves']]
+            rows.append({'game_id': result['game_id'], 'first': result['first'], 'winner': result['winner'], 
+                'moves': len(result['moves']), 'seconds_per_move': np.mean(seconds), 
+                'simulations_per_move': np.mean(simulations)})
+    return pd.DataFrame(rows)
+
+
+def summarize(results, sides):
+    '''
+    Wins, losses and draws of every side
+    '''
+    rows = []
+    for side in sides:
+        rows.append({'side': side['name'], 'wins': int((results['winner'] == side['name']).sum()), 
+            'draws': int(results['winner'].isna().sum()), 'games': len(results)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless AI-vs-AI arena')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=Config.MAX_WORKERS)
+    parser.add_argument('--board_size', type=int, default=Config.board_size)
+    parser.add_argument('--n_in_row', type=int, default=Config.n_in_row)
+    parser.add_argument('--think_time', type=float, nargs=2, default=[Config.THINK_TIME]*2)
+    parser.add_argument('--simulation_times', type=int, nargs=2, default=[Config.SIMULATION_TIMES]*2)
+    parser.add_argument('--config', type=json.loads, nargs=2, default=[{}, {}], 
+        help='Config overrides of each side as JSON, e.g. \'{"ROLLOUT_POLICY": "threat"}\' \'{}\'')
+    parser.add_argument('--output', default='arena.jsonl')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sides = [{'name': name, 'think_time': args.think_time[i], 'simulation_times': args.simulation_times[i], 
+        'config': args.config[i]} for i, name in enumerate(('A', 'B'))]
+    results = run_tournament(args.games, args.board_size, args.n_in_row, sides, args.workers, args.output, args.seed)
+    print(results)
+    print(summarize(results, sides))
@@ -0,0 +1,143 @@
+import numpy as np
+from itertools import islice
+
+from MCTSNode import MCTSNode
+import Config
+
+class ArrayTree(object):
+    '''
+    Struct-of-arrays storage of the search tree
+    Node i is described by parent[i], move[i], player[i], visited_times[i], win_times[i]
+    and its children are the nodes child_start[i] .. child_start[i]+child_count[i]-1.
+    Nodes hold no board: the state is rebuilt by replaying the moves from the root.
+    '''
+
+    def __init__(self, board, last_player, last_position, capacity=1024):
+        '''
+        board: the board of the root, used as the scratch board of the search
+        last_player: the player who made the last move
+        '''
+        self.board = board
+        self.width = board.state.shape[1]
+        self.size = 0
+        self.parent = np.zeros(capacity, dtype=np.int32)
+        self.move = np.zeros(capacity, dtype=np.int32)
+        self.player = np.zeros(capacity, dtype=np.int8)
+        self.visited_times = np.zeros(capacity, dtype=np.int32)
+        self.win_times = np.zeros(capacity, dtype=np.float64)
+        self.child_start = np.zeros(capacity, dtype=np.int32)
+        self.child_count = np.full(capacity, -1, dtype=np.int16) # -1: children not generated yet
+
+        self.root = self.__add_node(-1, last_player, -1)
+
+
+    def __add_node(self, parent, player, move):
+        if self.size == len(self.parent):
+            self.__grow()
+        index = self.size
+        self.parent[index] = parent
+        self.move[index] = move
+        self.player[index] = player
+        self.visited_times[index] = 0
+        self.win_times[index] = 0
+        self.child_start[index] = 0
+        self.child_count[index] = -1
+        self.size += 1
+        return index
+
+
+    def __grow(self):
+        '''
+        Double the capacity of every array
+        '''
+        for name in ('parent', 'move', 'player', 'visited_times', 'win_times', 'child_start'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.child_count = np.concatenate([self.child_count, np.full_like(self.child_count, -1)])
+
+
+    def expand(self, node):
+        '''
+        Generate the children of the node in the order of MCTSNode.candidate_positions
+        The board must be the state of the node
+        '''
+        child_player = -1*int(self.player[node])
+        candidates = MCTSNode(self.board, int(self.player[node]), None, None)
+        positions = list(islice(candidates.candidate_positions(), min(candidates.max_expend_num, Config.CHILDREN_NUM)))
+        start = self.size
+        for x, y in positions:
+            self.__add_node(node, child_player, x*self.width+y)
+        self.child_start[node] = start
+        self.child_count[node] = len(positions)
+
+
+    def position(self, node):
+        return divmod(int(self.move[node]), self.width)
+
+
+    def uct_scores(self, node, confident):
+        '''
+        UCT scores of all the children of the node in one vectorized step
+        '''
+        start = self.child_start[node]
+        end = start + self.child_count[node]
+        visited_times = self.visited_times[start:end]
+        return self.win_times[start:end]/visited_times \
+            + confident*np.sqrt(np.log(self.visited_times[node])/visited_times)
+
+
+    def select(self, confident):
+        '''
+        Descend from the root, playing the moves on the board
+        Stop at the first unvisited child, or at a terminal state
+        output: the selected node, the number of moves played on the board
+        '''
+        node = self.root
+        depth = 0
+        while not self.board.check_game_result()[0]:
+            if self.child_count[node] < 0:
+                self.expand(node)
+            start = self.child_start[node]
+            end = start + self.child_count[node]
+            unvisited = np.flatnonzero(self.visited_times[start:end] == 0)
+            if len(unvisited):
+                node = start + unvisited[0]
+            else:
+                node = start + int(np.argmax(self.uct_scores(node, confident)))
+            if self.board.move(self.position(node), int(self.player[node])):
+                depth += 1
+            if len(unvisited):
+                break
+        return node, depth
+
+
+    def backpropagate(self, node, results):
+        '''
+        Back propagate the counts of results {winner: count} from the node to the root
+        '''
+        path = []
+        while node >= 0:
+            path.append(node)
+            node = self.parent[node]
+        path = np.array(path)
+        players = self.player[path]
+        draws = results.get(None, 0)
+        self.win_times[path] += np.where(players == 1, results.get(1, 0) - 0.2*results.get(-1, 0),
+            results.get(-1, 0) - 0.2*results.get(1, 0)) + 0.1*draws
+        self.visited_times[path] += sum(results.values())
+
+
+    def best_child(self, confident):
+        '''
+        The child of the root with the best UCT score
+        '''
+        start = self.child_start[self.root]
+        return start + int(np.argmax(self.uct_scores(self.root, confident)))
+
+
+    def nbytes(self):
+        '''
+        Memory used by the node arrays
+        '''
+        return sum(getattr(self, name)[:self.size].nbytes for name in 
+            ('parent', 'move', 'player', 'visited_times', 'win_times', 'child_start', 'child_count'))
@@ -0,0 +1,76 @@
+import numpy as np
+
+class BatchRollout(object):
+    '''
+    Run K random playouts from the same state as one batched numpy computation
+    '''
+
+    def __init__(self, n_in_row, batch_size):
+        self.n_in_row = n_in_row
+        self.batch_size = batch_size
+
+
+    def run(self, state, player):
+        '''
+        input: state: the chess state of the leaf
+               player: the player who made the last move
+        output: the number of playouts won by 1, won by -1 and drawn, as {1: n, -1: n, None: n}
+        '''
+        height, width = state.shape
+        k = self.batch_size
+        states = np.repeat(state.reshape(1, height*width).astype(np.int8), k, axis=0)
+        winners = np.zeros(k, dtype=np.int8)
+        alive = np.ones(k, dtype=bool)
+        player = -1*player
+
+        while alive.any():
+            games = np.flatnonzero(alive)
+            boards = states[games]
+            empty = boards == 0
+
+            # Uniform random empty cell per game: the largest random key among the empty cells
+            keys = np.random.random(boards.shape)
+            keys[~empty] = -1
+            cells = keys.argmax(axis=1)
+            boards[np.arange(len(games)), cells] = player
+            states[games] = boards
+
+            won = self.__has_n_in_row((boards == player).reshape(-1, height, width))
+            winners[games[won]] = player
+            full = empty.sum(axis=1) == 1
+            alive[games[won | full]] = False
+            player = -1*player
+
+        n_first = int((winners == 1).sum())
+        n_second = int((winners == -1).sum())
+        return {1: n_first, -1: n_second, None: k - n_first - n_second}
+
+
+    def __has_n_in_row(self, stones):
+        '''
+        Convolution-style check over the batch: AND n shifted views of the stones in every direction
+        stones: bool array of shape (K, H, W)
+        '''
+        n = self.n_in_row
+        _, height, width = stones.shape
+        won = np.zeros(stones.shape[0], dtype=bool)
+        if height >= n:
+            line = stones[:, :height-n+1, :]
+            for i in range(1, n):
+                line = line & stones[:, i:height-n+1+i, :]
+            won |= line.any(axis=(1,2))
+        if width >= n:
+            line = stones[:, :, :width-n+1]
+            for i in range(1, n):
+                line = line & stones[:, :, i:width-n+1+i]
+            won |= line.any(axis=(1,2))
+        if height >= n and width >= n:
+            line = stones[:, :height-n+1, :width-n+1]
+            for i in range(1, n):
+                line = line & stones[:, i:height-n+1+i, i:width-n+1+i]
+            won |= line.any(axis=(1,2))
+            line = stones[:, :height-n+1, n-1:]
+            for i in range(1, n):
+                line = line & stones[:, i:height-n+1+i, n-1-i:width-i]
+            won |= line.any(axis=(1,2))
+        return won
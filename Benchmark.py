@@ -0,0 +1,263 @@
+'''
+Benchmarks of the search hot paths
+
+python Benchmark.py rollout
+python Benchmark.py selection
+python Benchmark.py suite --output bench.csv --compare bench_old.csv
+python Benchmark.py widening --board_sizes 8 15 --think_times 0.5 1 2 --games 20
+'''
+import argparse
+import contextlib
+import os
+import random
+import time
+import numpy as np
+import pandas as pd
+
+import Config
+from Arena import config_overrides, run_tournament
+from Board import new_board
+from MCTS import MCTS
+from MCTSNode import MCTSNode
+from RolloutPolicy import new_policy, rollout_policies
+
+
+def seeded_positions(board_size, n_in_row, count, moves, seed):
+    '''
+    Random positions of the given number of moves, none of them over
+    output: list of (board, last_player)
+    '''
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = new_board(np.zeros((board_size, board_size)), n_in_row)
+        player = Config.SECOND
+        for _ in range(moves):
+            player = -1*player
+            board.move(rng.choice(board.availables), player)
+            if board.is_over:
+                break
+        if not board.is_over:
+            positions.append((board, player))
+    return positions
+
+
+def tactical_positions(board_size, n_in_row, count, seed):
+    '''
+    Random positions where the player to move can make n in a row
+    output: list of (board, last_player)
+    '''
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, player = seeded_positions(board_size, n_in_row, 1, rng.randrange(2*n_in_row, board_size*board_size//2), 
+            rng.randrange(2**32))[0]
+        if board.winning_positions(-1*player):
+            positions.append((board, player))
+    return positions
+
+
+def benchmark_rollout_policies(board_size=8, n_in_row=5, duration=2.0, seed=0):
+    '''
+    For every rollout policy:
+        playouts per second and average playout length from seeded positions,
+        win rate of the player to move in positions with a winning move (1.0 is a perfect signal)
+    '''
+    positions = seeded_positions(board_size, n_in_row, 20, 4, seed)
+    tactics = tactical_positions(board_size, n_in_row, 20, seed)
+    rows = []
+    for name in rollout_policies:
+        random.seed(seed)
+        mcts = MCTS(positions[0][0], duration, 0)
+        mcts.policy = new_policy(name)
+
+        playouts = 0
+        begin = time.time()
+        while time.time() - begin < duration:
+            board, player = positions[playouts % len(positions)]
+            mcts.playout(board, player)
+            playouts += 1
+        elapsed = time.time() - begin
+
+        lengths = []
+        for board, player in positions:
+            board = board.copy()
+            moves = len(board.unavailables)
+            while not board.is_over:
+                player = -1*player
+                board.move(mcts.policy(board, player), player)
+            lengths.append(len(board.unavailables) - moves)
+
+        wins = 0
+        for board, player in tactics:
+            for _ in range(10):
+                wins += mcts.playout(board, player) == -1*player
+        rows.append({'policy': name, 'playouts_per_sec': playouts/elapsed, 'avg_length': np.mean(lengths),
+            'tactical_win_rate': wins/(10*len(tactics))})
+    return pd.DataFrame(rows)
+
+
+def benchmark_tree_policies(board_size=8, n_in_row=5, simulations=3000, duration=2.0, seed=0):
+    '''
+    Selections per second of every tree policy, on the expanded nodes of a tree grown from a seeded position
+    '''
+    random.seed(seed)
+    np.random.seed(seed)
+    board, player = seeded_positions(board_size, n_in_row, 1, 4, seed)[0]
+    mcts = MCTS(board, float('inf'), simulations)
+    root = mcts.new_root(player, board.last_position)
+    mcts.monte_carlo_tree_search(root)
+
+    nodes, queue = [], [root]
+    while queue:
+        node = queue.pop()
+        if node.fully_expanded() and node.children:
+            nodes.append(node)
+        queue.extend(node.children)
+
+    tree_policy = Config.TREE_POLICY
+    rows = []
+    for name in ('uct', 'fast_uct'):
+        Config.TREE_POLICY = name
+        selections = 0
+        begin = time.time()
+        while time.time() - begin < duration:
+            for node in nodes:
+                mcts.select_child(node)
+            selections += len(nodes)
+        rows.append({'tree_policy': name, 'nodes': len(nodes), 'selections_per_sec': selections/(time.time() - begin)})
+    Config.TREE_POLICY = tree_policy
+    return pd.DataFrame(rows)
+
+
+def expand_children(node):
+    '''
+    Expand the node up to its max children number, as the first visits of a search do
+    '''
+    while not node.fully_expanded():
+        node.expand_child()
+    return node
+
+
+def rate(function, items, duration):
+    '''
+    Calls per second of function over the items, repeated for the duration
+    '''
+    calls = 0
+    begin = time.time()
+    while time.time() - begin < duration:
+        for item in items:
+            function(item)
+        calls += len(items)
+    return calls/(time.time() - begin)
+
+
+def benchmark_suite(board_sizes=(8, 15, 19), n_in_row=5, duration=1.0, seed=0):
+    '''
+    The hot paths over fixed seeded positions of every board size, with the settings of the board size
+    output: a DataFrame of (benchmark, board_size, value, unit)
+    '''
+    rows = []
+    for board_size in board_sizes:
+        with config_overrides(Config.board_size_settings(board_size)):
+            random.seed(seed)
+            np.random.seed(seed)
+            positions = seeded_positions(board_size, n_in_row, 10, 2*board_size, seed)
+
+            def move_and_undo(position):
+                board, player = position
+                board.move(board.availables[len(board.availables)//2], -1*player)
+                board.undo_move()
+            rows.append(('move_undo', board_size, rate(move_and_undo, positions, duration), 'calls/s'))
+            rows.append(('check_game_result', board_size, 
+                rate(lambda position: position[0].check_game_result(), positions, duration), 'calls/s'))
+
+            latency = 1/rate(lambda position: position[0].find_position_by_pattern(), positions, duration)
+            rows.append(('find_position_by_pattern', board_size, 1e6*latency, 'us'))
+
+            latency = 1/rate(lambda position: MCTSNode(position[0].copy(), position[1], None, None).untried_actions, 
+                positions, duration)
+            rows.append(('untried_actions', board_size, 1e6*latency, 'us'))
+
+            latency = 1/rate(lambda position: expand_children(MCTSNode(position[0].copy(), position[1], None, None)), 
+                positions, duration)
+            rows.append(('expand_children', board_size, 1e6*latency, 'us'))
+
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+                config_overrides({'EARLY_STOP': False}):
+                mcts = MCTS(positions[0][0], duration, float('inf'))
+                rows.append(('rollout', board_size, rate(lambda position: mcts.playout(*position), positions, duration), 
+                    'playouts/s'))
+
+                mcts = MCTS(positions[0][0], duration, float('inf'))
+                root = mcts.new_root(positions[0][1], positions[0][0].last_position)
+                begin = time.time()
+                mcts.monte_carlo_tree_search(root)
+                rows.append(('monte_carlo_tree_search', board_size, mcts.simulation_times/(time.time() - begin), 
+                    'simulations/s'))
+    return pd.DataFrame(rows, columns=['benchmark', 'board_size', 'value', 'unit'])
+
+
+def benchmark_widening(board_sizes, n_in_row, think_times, games, workers, seed=0):
+    '''
+    Strength per think time of the progressive widening against the fixed CHILDREN_NUM cap:
+    games between the two settings at every board size and think time, the colors swapped every game
+    '''
+    sides = [{'name': 'widening', 'config': {'PROGRESSIVE_WIDENING': True}}, 
+        {'name': 'fixed', 'config': {'PROGRESSIVE_WIDENING': False}}]
+    rows = []
+    for board_size in board_sizes:
+        for think_time in think_times:
+            for side in sides:
+                side['think_time'], side['simulation_times'] = think_time, float('inf')
+            results = run_tournament(games, board_size, n_in_row, sides, workers, os.devnull, seed)
+            wins = {side['name']: int((results['winner'] == side['name']).sum()) for side in sides}
+            rows.append({'board_size': board_size, 'think_time': think_time, 'games': games, 
+                'widening_wins': wins['widening'], 'fixed_wins': wins['fixed'], 
+                'draws': int(results['winner'].isna().sum()), 
+                'widening_score': (wins['widening'] + 0.5*results['winner'].isna().sum())/games})
+    return pd.DataFrame(rows)
+
+
+def compare(results, baseline):
+    '''
+    Join the results with a saved baseline, ratio > 1 is faster for the rates and slower for the latencies
+    '''
+    merged = results.merge(baseline, on=['benchmark', 'board_size', 'unit'], suffixes=('', '_baseline'))
+    merged['ratio'] = merged['value']/merged['value_baseline']
+    return merged
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the search hot paths')
+    parser.add_argument('name', choices=['rollout', 'selection', 'suite', 'widening'])
+    parser.add_argument('--board_size', type=int, default=Config.board_size)
+    parser.add_argument('--n_in_row', type=int, default=Config.n_in_row)
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--board_sizes', type=int, nargs='+', default=[8, 15, 19])
+    parser.add_argument('--output', help='CSV file to save the suite results')
+    parser.add_argument('--compare', help='CSV file of the suite results to compare with')
+    parser.add_argument('--think_times', type=float, nargs='+', default=[0.5, 1, 2])
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=Config.MAX_WORKERS)
+    args = parser.parse_args()
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    Config.set_board_size(args.board_size)
+
+    if args.name == 'rollout':
+        print(benchmark_rollout_policies(args.board_size, args.n_in_row, args.duration))
+    elif args.name == 'selection':
+        print(benchmark_tree_policies(args.board_size, args.n_in_row, duration=args.duration))
+    elif args.name == 'suite':
+        results = benchmark_suite(args.board_sizes, args.n_in_row, args.duration)
+        print(results)
+        if args.output:
+            results.to_csv(args.output, index=False)
+        if args.compare:
+            print(compare(results, pd.read_csv(args.compare)))
+    elif args.name == 'widening':
+        results = benchmark_widening(args.board_sizes, args.n_in_row, args.think_times, args.games, args.workers)
+        print(results)
+        if args.output:
+            results.to_csv(args.output, index=False)
@@ -0,0 +1,247 @@
+import numpy as np
+
+import Config
+from Board import zobrist_table, line_windows, pattern_positions
+
+class BitBoard(object):
+    '''
+    Board engine backed by one integer bitboard per player
+
+    Cell (x,y) is bit x*(width+1)+y. Every row carries one empty guard bit,
+    so shifting a line past the board edge never wraps onto the next row.
+    Python ints grow as needed, so the same code covers 8x8, 15x15 and 19x19.
+    '''
+
+    def __init__(self, state, n_in_row):
+        '''
+        state: the chess state to build the bitboards from
+        n_in_row: the number of chess in a row to win
+        '''
+        self.height = state.shape[0]
+        self.width = state.shape[1]
+        self.n_in_row = n_in_row
+        self.stride = self.width + 1
+        # Bit shifts of vertical, horizontal, diagonal and anti-diagonal lines
+        self.directions = (self.stride, 1, self.stride+1, self.stride-1)
+
+        self.zobrist_keys = zobrist_table(self.height, self.width)
+        self.zobrist = 0
+
+        self.full = 0
+        self.bits = {1: 0, -1: 0}
+        for i in range(self.height):
+            for j in range(self.width):
+                bit = 1 << (i*self.stride + j)
+                self.full |= bit
+                if state[i][j] != 0:
+                    self.bits[int(state[i][j])] |= bit
+                    self.zobrist ^= self.zobrist_keys[int(state[i][j])][i*self.width+j]
+
+        self.last_position = None
+        self.history = []
+        self._availables = None
+        self._unavailables = None
+        self._state = None
+        self.is_over, self.winner = self.__scan_game_result()
+
+
+    def copy(self):
+        '''
+        O(1) copy, the bitboards are immutable ints
+        The cached lists and state are not shared, they are rebuilt on demand
+        '''
+        board = BitBoard.__new__(BitBoard)
+        board.__dict__.update(self.__dict__)
+        board.bits = dict(self.bits)
+        board._availables = None
+        board._unavailables = None
+        board._state = None
+        board.history = []
+        return board
+
+
+    @property
+    def availables(self):
+        if self._availables is None:
+            self._availables = self.__positions(self.full & ~(self.bits[1] | self.bits[-1]))
+        return self._availables
+
+
+    @property
+    def unavailables(self):
+        if self._unavailables is None:
+            self._unavailables = self.__positions(self.bits[1] | self.bits[-1])
+        return self._unavailables
+
+
+    @property
+    def state(self):
+        '''
+        The chess state as a numpy array, rebuilt only after a move
+        '''
+        if self._state is None:
+            state = np.zeros((self.height, self.width))
+            for player in (1, -1):
+                for i, j in self.__positions(self.bits[player]):
+                    state[i,j] = player
+            self._state = state
+        return self._state
+
+
+    def move(self, position, player):
+        '''
+        input: position, player
+        output: if move successfully, set the bit of the player and return True;
+                else, return False
+        '''
+        x,y = position
+        bit = 1 << (x*self.stride + y)
+        if (self.bits[1] | self.bits[-1]) & bit:
+            return False
+        self.history.append((player, self.last_position, self.is_over, self.winner))
+        self.bits[player] |= bit
+        self.last_position = (x,y)
+        self.zobrist ^= self.zobrist_keys[player][x*self.width+y]
+        # Keep the caches in step instead of rebuilding them
+        if self._availables is not None:
+            self._availables.remove((x,y))
+        if self._unavailables is not None:
+            self._unavailables.append((x,y))
+        if self._state is not None:
+            self._state[x,y] = player
+        if not self.is_over:
+            if self.__has_n_in_row(self.bits[player]):
+                self.is_over, self.winner = True, player
+            elif (self.bits[1] | self.bits[-1]) == self.full:
+                self.is_over, self.winner = True, None
+        return True
+
+
+    def undo_move(self):
+        '''
+        Take back the last move and restore the cached game result
+        Only the moves made since the board was built or copied can be undone
+        '''
+        x,y = self.last_position
+        player, self.last_position, self.is_over, self.winner = self.history.pop()
+        self.bits[player] &= ~(1 << (x*self.stride + y))
+        self.zobrist ^= self.zobrist_keys[player][x*self.width+y]
+        if self._availables is not None:
+            self._availables.append((x,y))
+        if self._unavailables is not None:
+            self._unavailables.remove((x,y))
+        if self._state is not None:
+            self._state[x,y] = 0
+
+
+    def nearest_positions(self):
+        '''
+        The empty positions within Config.CANDIDATE_RADIUS of a chess, 
+        by shifting the chess in the 8 directions once per step of the radius
+        '''
+        occupied = self.bits[1] | self.bits[-1]
+        near = occupied
+        for _ in range(Config.CANDIDATE_RADIUS):
+            grown = near
+            for d in self.directions:
+                grown |= (near << d) | (near >> d)
+            near = grown & self.full
+        return self.__positions(near & ~occupied)
+
+
+    def neighbour_counts(self):
+        '''
+        The number of chess within Config.CANDIDATE_RADIUS of every cell, indexed by x*width+y
+        '''
+        r = Config.CANDIDATE_RADIUS
+        occupied = np.pad(self.state != 0, r).astype(np.int16)
+        counts = sum(occupied[r+dx:r+dx+self.height, r+dy:r+dy+self.width] 
+            for dx in range(-r, r+1) for dy in range(-r, r+1) if (dx,dy) != (0,0))
+        return counts.ravel()
+
+
+    def winning_positions(self, player):
+        '''
+        The empty positions that make n in a row for the player
+        For each direction and each place of the gap in the line, shift the chess of the player onto the gap
+        '''
+        bits = self.bits[player]
+        empty = self.full & ~(self.bits[1] | self.bits[-1])
+        winning = 0
+        for d in self.directions:
+            for gap in range(self.n_in_row):
+                line = empty
+                for k in range(self.n_in_row):
+                    if k == gap:
+                        continue
+                    offset = (k-gap)*d
+                    line &= (bits >> offset) if offset > 0 else (bits << -offset)
+                    if not line:
+                        break
+                winning |= line
+        return self.__positions(winning)
+
+
+    def zobrist_after(self, position, player):
+        '''
+        The Zobrist hash of the position after the player moves in position
+        '''
+        x,y = position
+        return self.zobrist ^ self.zobrist_keys[player][x*self.width+y]
+
+
+    def check_game_result(self):
+        '''
+        Check the game result
+
+        output: is_over: bool
+                winner: if no winner, return None, else return winner
+        '''
+        return self.is_over, self.winner
+
+
+    def find_position_by_pattern(self):
+        '''
+        Find the pattern in this state
+        Choose the best position in the availables
+        '''
+        if len(self.unavailables) < self.n_in_row:
+            return []
+
+        windows = line_windows(self.height, self.width, self.n_in_row)
+        return pattern_positions(self.state.ravel()[windows], windows, self.width, self.n_in_row)
+
+
+    def __has_n_in_row(self, bits):
+        '''
+        Shift-and-mask check of n chess in a row in any direction
+        '''
+        for d in self.directions:
+            line = bits
+            for k in range(1, self.n_in_row):
+                line &= bits >> (k*d)
+                if not line:
+                    break
+            if line:
+                return True
+        return False
+
+
+    def __scan_game_result(self):
+        for player in (1, -1):
+            if self.__has_n_in_row(self.bits[player]):
+                return True, player
+        if (self.bits[1] | self.bits[-1]) == self.full:
+            return True, None
+        return False, None
+
+
+    def __positions(self, bits):
+        '''
+        Convert the set bits to a list of (x,y)
+        '''
+        positions = []
+        for index, bit in enumerate(bin(bits)[:1:-1]):
+            if bit == '1':
+                positions.append(divmod(index, self.stride))
+        return positions
@@ -1,5 +1,151 @@
 import numpy as np 
 import pandas as pd 
+import random
+
+import Config
+
+zobrist_tables = {}
+line_windows_cache = {}
+cell_windows_cache = {}
+neighbour_cells_cache = {}
+symmetries_cache = {}
+
+
+def zobrist_table(height, width):
+    '''
+    Random 64-bit keys of every cell for each player: {player: [key of cell x*width+y]}
+    The keys are seeded, so the hash of a position is the same in every process
+    '''
+    if (height, width) not in zobrist_tables:
+        rng = random.Random(Config.ZOBRIST_SEED)
+        zobrist_tables[(height, width)] = {player: [rng.getrandbits(64) for _ in range(height*width)] for player in (1, -1)}
+    return zobrist_tables[(height, width)]
+
+
+def line_windows(height, width, n_in_row):
+    '''
+    Flat cell indices of every n_in_row window on the board, in the vertical, horizontal,
+    diagonal and anti-diagonal directions. Shape: (windows number, n_in_row)
+    '''
+    key = (height, width, n_in_row)
+    if key not in line_windows_cache:
+        windows = []
+        steps = np.arange(n_in_row)
+        for dx, dy in ((1,0), (0,1), (1,1), (1,-1)):
+            for x in range(height):
+                for y in range(width):
+                    end_x, end_y = x + dx*(n_in_row-1), y + dy*(n_in_row-1)
+                    if 0 <= end_x < height and 0 <= end_y < width:
+                        windows.append((x + dx*steps)*width + y + dy*steps)
+        line_windows_cache[key] = np.array(windows, dtype=np.int32).reshape(-1, n_in_row)
+    return line_windows_cache[key]
+
+
+def cell_windows(height, width, n_in_row):
+    '''
+    The indices of the line_windows through every cell: [windows of cell x*width+y]
+    '''
+    key = (height, width, n_in_row)
+    if key not in cell_windows_cache:
+        through = [[] for _ in range(height*width)]
+        for index, window in enumerate(line_windows(height, width, n_in_row)):
+            for cell in window:
+                through[cell].append(index)
+        cell_windows_cache[key] = [np.array(indices, dtype=np.int32) for indices in through]
+    return cell_windows_cache[key]
+
+
+def neighbour_cells(height, width, radius=1):
+    '''
+    The flat indices of the cells around every cell within the radius: [neighbours of cell x*width+y]
+    '''
+    key = (height, width, radius)
+    if key not in neighbour_cells_cache:
+        neighbours = []
+        for x in range(height):
+            for y in range(width):
+                neighbours.append(np.array([i*width+j for i in range(max(x-radius, 0), min(x+radius+1, height)) 
+                    for j in range(max(y-radius, 0), min(y+radius+1, width)) if (i,j) != (x,y)], dtype=np.int32))
+        neighbour_cells_cache[key] = neighbours
+    return neighbour_cells_cache[key]
+
+
+def pattern_positions(values, windows, width, n_in_row):
+    '''
+    Find the positions of the patterns in all the windows at once
+    values: the chess in each window, windows: the flat cell indices of each window
+
+    For a window starting one cell before a chess:
+        n-1 chess of one player and one empty: the empty position
+        n-2 chess of one player and two empties: the first empty, and the second one if the first empty is at the start
+        n-3 chess in total and the n-2 cells from the chess are the same: the first empty
+    For a window starting at a chess:
+        n-1 chess of one player and one empty: the empty position
+    '''
+    n = n_in_row
+    empty = values == 0
+    empty_num = empty.sum(axis=1)
+    total = np.abs(values.sum(axis=1))
+    first = empty.argmax(axis=1)
+    after_chess = values[:, 1] != 0
+    at_chess = values[:, 0] != 0
+
+    four = (empty_num == 1) & (total == n-1)
+    three = (empty_num == 2) & (total == n-2)
+    split_three = (empty_num > 0) & (total == n-3) & (values[:, 1:n-1] == values[:, 1:2]).all(axis=1)
+
+    first_rows = np.flatnonzero((after_chess & (four | three | split_three)) | (at_chess & four))
+    second_rows = np.flatnonzero(after_chess & three & (first == 0))
+    second = empty[second_rows, 1:].argmax(axis=1) + 1
+
+    cells = np.concatenate([windows[first_rows, first[first_rows]], windows[second_rows, second]])
+    return [divmod(int(cell), width) for cell in np.unique(cells)]
+
+
+def symmetries(height, width):
+    '''
+    The flat index permutations of the board symmetries (8 for a square board, 4 otherwise):
+    the transformed state is state.ravel()[permutation], the cell i moves to inverse[i]
+    output: [(permutation, inverse)], the identity first
+    '''
+    if (height, width) not in symmetries_cache:
+        cells = np.arange(height*width).reshape(height, width)
+        if height == width:
+            transforms = [np.rot90(cells, k) for k in range(4)] + [np.fliplr(np.rot90(cells, k)) for k in range(4)]
+        else:
+            transforms = [cells, np.flipud(cells), np.fliplr(cells), np.rot90(cells, 2)]
+        symmetries_cache[(height, width)] = [(t.ravel(), np.argsort(t.ravel())) for t in transforms]
+    return symmetries_cache[(height, width)]
+
+
+def canonical_form(state):
+    '''
+    The key shared by all the symmetric states: the smallest bytes of the transformed states
+    output: key, (permutation, inverse) of the symmetry giving the key
+    '''
+    values = state.ravel().astype(np.int8)
+    return min(((values[symmetry[0]].tobytes(), symmetry) for symmetry in symmetries(*state.shape)), 
+        key=lambda form: form[0])
+
+
+def stabilizer(state):
+    '''
+    The cell maps (inverse) of the symmetries other than the identity that leave the state unchanged
+    '''
+    values = state.ravel()
+    return [inverse for permutation, inverse in symmetries(*state.shape)[1:] 
+        if np.array_equal(values[permutation], values)]
+
+
+def new_board(state, n_in_row):
+    '''
+    Build a board with the engine chosen in Config.BOARD_ENGINE
+    '''
+    if Config.BOARD_ENGINE == 'bitboard':
+        from BitBoard import BitBoard
+        return BitBoard(state, n_in_row)
+    return Board(state, n_in_row)
+
 
 class Board(object):
 
@@ -13,6 +159,46 @@ class Board(object):
         self.availables = [(i,j) for i in range(self.state.shape[0]) for j in range(self.state.shape[1]) if self.state[i][j] == 0]
         self.unavailables = [(i,j) for i in range(self.state.shape[0]) for j in range(self.state.shape[1]) if self.state[i][j] != 0]
 
+        # Cached game result, updated incrementally by move()
+        self.last_position = None
+        self.is_over, self.winner = self.__scan_game_result()
+
+        # Move stack for undo_move()
+        self.history = []
+
+        # Zobrist hash of the position, updated incrementally by move()
+        self.zobrist_keys = zobrist_table(self.state.shape[0], self.state.shape[1])
+        self.zobrist = 0
+        for i, j in self.unavailables:
+            self.zobrist ^= self.zobrist_keys[int(self.state[i][j])][i*self.state.shape[1]+j]
+
+        # Candidate index: the number of chess around every cell and the chess of each player in every window.
+        # The moves are queued in index_pending and applied when the index is read,
+        # so rollouts that undo their moves never touch it
+        height, width = self.state.shape
+        self.windows = line_windows(height, width, n_in_row)
+        self.cell_windows = cell_windows(height, width, n_in_row)
+        self.neighbour_cells = neighbour_cells(height, width, Config.CANDIDATE_RADIUS)
+        self.neighbours = np.zeros(height*width, dtype=np.int16)
+        self.window_stones = {1: np.zeros(len(self.windows), dtype=np.int16), -1: np.zeros(len(self.windows), dtype=np.int16)}
+        self.index_pending = [(i*width+j, int(self.state[i][j])) for i, j in self.unavailables]
+
+
+    def copy(self):
+        '''
+        Copy the board without rebuilding availables and unavailables from the state
+        '''
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.state = self.state.copy()
+        board.availables = list(self.availables)
+        board.unavailables = list(self.unavailables)
+        board.history = []
+        board.neighbours = self.neighbours.copy()
+        board.window_stones = {player: stones.copy() for player, stones in self.window_stones.items()}
+        board.index_pending = list(self.index_pending)
+        return board
+
 
     def move(self, position, player):
         '''
@@ -24,22 +210,135 @@ class Board(object):
         if self.state[x,y] != 0:
             return False
         else:
+            self.history.append((self.last_position, self.is_over, self.winner))
             self.state[x,y] = player
             self.availables.remove((x,y))
             self.unavailables.append((x,y))
+            self.last_position = (x,y)
+            self.zobrist ^= self.zobrist_keys[player][x*self.state.shape[1]+y]
+            self.index_pending.append((x*self.state.shape[1]+y, player))
+            if not self.is_over:
+                if self.__check_last_move(x, y, player):
+                    self.is_over, self.winner = True, player
+                elif len(self.availables) == 0:
+                    self.is_over, self.winner = True, None
             return True
 
 
+    def undo_move(self):
+        '''
+        Take back the last move and restore the cached game result
+        Only the moves made since the board was built or copied can be undone
+        '''
+        x,y = self.unavailables.pop()
+        player = int(self.state[x,y])
+        self.zobrist ^= self.zobrist_keys[player][x*self.state.shape[1]+y]
+        if self.index_pending:
+            self.index_pending.pop()
+        else:
+            self.__update_index(x*self.state.shape[1]+y, player, -1)
+        self.state[x,y] = 0
+        self.availables.append((x,y))
+        self.last_position, self.is_over, self.winner = self.history.pop()
+
+
+    def __update_index(self, cell, player, count):
+        self.neighbours[self.neighbour_cells[cell]] += count
+        self.window_stones[player][self.cell_windows[cell]] += count
+
+
+    def sync_index(self):
+        '''
+        Apply the queued moves to the candidate index
+        '''
+        for cell, player in self.index_pending:
+            self.__update_index(cell, player, 1)
+        self.index_pending = []
+
+
+    def nearest_positions(self):
+        '''
+        The empty positions within Config.CANDIDATE_RADIUS of a chess, read from the candidate index
+        '''
+        self.sync_index()
+        cells = np.flatnonzero((self.neighbours > 0) & (self.state.ravel() == 0))
+        width = self.state.shape[1]
+        return [divmod(int(cell), width) for cell in cells]
+
+
+    def neighbour_counts(self):
+        '''
+        The number of chess within Config.CANDIDATE_RADIUS of every cell, indexed by x*width+y
+        '''
+        self.sync_index()
+        return self.neighbours
+
+
+    def winning_positions(self, player):
+        '''
+        The empty positions that make n in a row for the player
+        Read from the windows with n-1 chess of the player and none of the opponent
+        '''
+        self.sync_index()
+        rows = np.flatnonzero((self.window_stones[player] == self.n_in_row-1) & (self.window_stones[-1*player] == 0))
+        if len(rows) == 0:
+            return []
+        windows = self.windows[rows]
+        cells = windows[self.state.ravel()[windows] == 0]
+        width = self.state.shape[1]
+        return [divmod(int(cell), width) for cell in np.unique(cells)]
+
+
+    def zobrist_after(self, position, player):
+        '''
+        The Zobrist hash of the position after the player moves in position
+        '''
+        x,y = position
+        return self.zobrist ^ self.zobrist_keys[player][x*self.state.shape[1]+y]
+
+
     def check_game_result(self):
         '''
         Check the game result
+        The result is cached and only the lines through the last move are scanned in move()
 
         output: is_over: bool
                 winner: if no winner, return None, else return winner
         '''
-        # unavailables = [(i,j) for i in range(self.state.shape[0]) for j in range(self.state.shape[1]) if self.state[i][j] != 0]
-        # print(unavailables)
-        if(len(self.unavailables) < self.n_in_row + 2):
+        return self.is_over, self.winner
+
+
+    def __check_last_move(self, x, y, player):
+        '''
+        Whether the stone in (x,y) makes n in a row
+        Only the four lines through (x,y) are scanned
+        '''
+        state = self.state
+        height = state.shape[0]
+        width = state.shape[1]
+        for dx, dy in ((1,0), (0,1), (1,1), (1,-1)):
+            count = 1
+            i, j = x+dx, y+dy
+            while 0 <= i < height and 0 <= j < width and state[i,j] == player:
+                count += 1
+                i += dx; j += dy
+            i, j = x-dx, y-dy
+            while 0 <= i < height and 0 <= j < width and state[i,j] == player:
+                count += 1
+                i -= dx; j -= dy
+            if count >= self.n_in_row:
+                return True
+        return False
+
+
+    def __scan_game_result(self):
+        '''
+        Check the game result by scanning every stone
+        Used once when the board is built from an arbitrary state
+        '''
+        if(len(self.unavailables) < self.n_in_row):
+            if len(self.availables) == 0:
+                return True, None
             return False, None
 
         state = self.state
@@ -76,83 +375,12 @@ class Board(object):
         Find the pattern in this state
         Choose the best position in the availables
         '''
-        children_list = []
-        
         if(len(self.unavailables) < self.n_in_row):
-            return children_list
+            return []
 
-        state = self.state
-        height = state.shape[0]
-        width  = state.shape[1]
-        for chess in self.unavailables:
-            row = chess[0]; col = chess[1]
-            # Check in vertical
-            if (row >= 1) and (row <= height-self.n_in_row+1):
-                pattern_5 = [state[row-1+i][col] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    pattern_3 = [state[row+i][col] for i in range(self.n_in_row-2)]
-                    empty_in_pattern = self.__find_position_by_pattern(pattern_5, pattern_3)
-                    for empty_index in empty_in_pattern:
-                        children_list.append((row-1+empty_index, col))
-            if (row >= 0) and (row <= height-self.n_in_row):
-                pattern_5 = [state[row+i][col] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    if (len(set(pattern_5)) == 2) and (abs(sum(pattern_5)) == self.n_in_row-1):
-                        children_list.append((row+4, col))
-
-            # Check in horizontal
-            if (col >= 1) and (col <= width-self.n_in_row+1):
-                pattern_5 = [state[row][col-1+i] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    pattern_3 = [state[row][col+i] for i in range(self.n_in_row-2)]
-                    empty_in_pattern = self.__find_position_by_pattern(pattern_5, pattern_3)
-                    for empty_index in empty_in_pattern:
-                        children_list.append((row, col-1+empty_index))
-            if (col >= 0) and (col <= width-self.n_in_row):
-                pattern_5 = [state[row][col+i] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    if (len(set(pattern_5)) == 2) and (abs(sum(pattern_5)) == self.n_in_row-1):
-                        children_list.append((row, col+4))
-
-            # Check in diagonal
-            if (row >= 1) and (row <= height-self.n_in_row+1) and (col >= 1) and (col <= width-self.n_in_row+1):
-                pattern_5 = [state[row-1+i][col-1+i] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    pattern_3 = [state[row+i][col+i] for i in range(self.n_in_row-2)]
-                    empty_in_pattern = self.__find_position_by_pattern(pattern_5, pattern_3)
-                    for empty_index in empty_in_pattern:
-                        children_list.append((row-1+empty_index, col-1+empty_index))
-            if (col >= 0) and (col <= width-self.n_in_row) and (row >= 0) and (row <= height-self.n_in_row):
-                pattern_5 = [state[row+i][col+i] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    if (len(set(pattern_5)) == 2) and (abs(sum(pattern_5)) == self.n_in_row-1):
-                        children_list.append((row+4, col+4))
-
-            # Check in anti-diagonal
-            if (row >= 1) and (row <= height-self.n_in_row+1) and (col >= self.n_in_row-2) and (col <= width-2):
-                pattern_5 = [state[row-1+i][col+1-i] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    pattern_3 = [state[row+i][col-i] for i in range(self.n_in_row-2)]
-                    empty_in_pattern = self.__find_position_by_pattern(pattern_5, pattern_3)
-                    for empty_index in empty_in_pattern:
-                        children_list.append((row-1+empty_index, col+1-empty_index))
-            if (col >= self.n_in_row-1) and (col <= width-1) and (row >= 0) and (row <= height-self.n_in_row):
-                pattern_5 = [state[row+i][col-i] for i in range(self.n_in_row)]
-                if 0 in pattern_5:
-                    if (len(set(pattern_5)) == 2) and (abs(sum(pattern_5)) == self.n_in_row-1):
-                        children_list.append((row+4, col-4))
-        return list(set(children_list))
-
-
-    def __find_position_by_pattern(self, pattern_5, pattern_3):
-        pattern_sum = sum(pattern_5)
-        pattern_set = len(set(pattern_5))
-        empty_in_pattern = []
-        if (abs(pattern_sum) == self.n_in_row-1) and (pattern_set == 2):
-            empty_in_pattern.append(pattern_5.index(0))
-        elif (abs(pattern_sum) == self.n_in_row-2) and (pattern_set == 2):
-            empty_in_pattern.append(pattern_5.index(0))
-            empty_in_pattern.append(pattern_5.index(0, 1))
-        elif (abs(pattern_sum) == self.n_in_row-3) and (len(set(pattern_3)) == 1) and (list(set(pattern_3)) != 0):
-            empty_in_pattern.append(pattern_5.index(0))
-        return list(set(empty_in_pattern))
\ No newline at end of file
+        # Only the windows with n-2 chess of one player and an empty can match a pattern
+        self.sync_index()
+        first, second = self.window_stones[1], self.window_stones[-1]
+        rows = np.flatnonzero((np.maximum(first, second) >= self.n_in_row-2) & (first + second < self.n_in_row))
+        windows = self.windows[rows]
+        return pattern_positions(self.state.ravel()[windows], windows, self.state.shape[1], self.n_in_row)
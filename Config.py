@@ -10,8 +10,10 @@ SECOND = -1
 '''
 Chess
 '''
-board_size = 8
+board_size = 8 # 8, 15 and 19 are supported, use set_board_size to change it at run time
 n_in_row = 5
+CANDIDATE_RADIUS = 1 if board_size < 15 else 2 # the empty positions within this distance of a chess are tried first
+BOARD_ENGINE = 'array' # 'array' or 'bitboard'
 
 '''
 Player
@@ -24,6 +26,49 @@ AI
 '''
 THINK_TIME = 10
 SIMULATION_TIMES = 10000
-CHILDREN_NUM = 10
-CONFIDENT = 6/board_size-0.5
+CHILDREN_NUM = 10 # max children of a node, unless PROGRESSIVE_WIDENING
+PROGRESSIVE_WIDENING = False # a node visited n times allows PW_K*(n+1)^PW_ALPHA children instead of CHILDREN_NUM
+PW_K = 1
+PW_ALPHA = 0.5
+EARLY_STOP = True # stop before THINK_TIME once the best move is decided
+STATS_INTERVAL = 1 # seconds between two calls of MCTS.stats_callback
+PROFILE_DECISION = False # run every decision under cProfile and print the hot functions
+SOLVER = True # MCTS-Solver: propagate the proven wins and losses and skip the solved subtrees
+CONFIDENT = max(6/board_size-0.5, 0.25) # 0.25 from 8x8 up, it would turn negative on large boards
+TREE_POLICY = 'fast_uct' # 'uct' or 'fast_uct' (parent log cached, children scored together)
+VECTOR_SCORE_MIN = 32 # children number from which fast_uct scores with numpy
+SEARCH_MODE = 'serial' # 'serial', 'root' (root-parallel over a process pool) or 'tree' (threads on a shared tree, batched rollouts)
+MAX_WORKERS = 4
+VIRTUAL_LOSS = 1 # losses added on the path of a pending playout in the tree-parallel search
+OPENING_BOOK = 'opening_book.bin' # the book built by OpeningBook.py, no book if None or missing
+STATS_CACHE = None # SQLite file of the position statistics shared across games and processes, e.g. 'stats_cache.db'
+STATS_CACHE_SIZE = 1000000 # max positions in the statistics cache
+STATS_CACHE_MIN_VISITS = 20 # new visits of a node before it is saved in the statistics cache
+STATS_CACHE_PRIOR = 20 # max visits a cached position starts with
+REUSE_TREE = True # keep the search tree of the AI service between turns
+PONDER = True # search the kept tree while the human is thinking, needs REUSE_TREE
+PONDER_SIMULATIONS = 50000 # max simulations of one ponder, bounds the memory of the tree
+TREE_STORAGE = 'object' # 'object' (MCTSNode) or 'array' (struct-of-arrays without boards in the nodes)
+TRANSPOSITION_TABLE = False # share the statistics of the same position reached by different move orders
+TT_SIZE = 100000 # max entries of the transposition table, the least recently used is evicted (bounds the table, not the tree)
+ZOBRIST_SEED = 20200501
+SYMMETRY_PRUNING = True # expand one move per class of moves equivalent under the symmetries of the board
+LEAF_BATCH_SIZE = 1 # playouts per leaf, more than 1 runs them batched in numpy
+TREE_LEAF_BATCH_SIZE = 16 # playouts per leaf of the tree-parallel search when LEAF_BATCH_SIZE is 1
+ROLLOUT_POLICY = 'random' # 'random', 'threat' (win, block, else near a chess) or 'weighted' (by the chess around)
+ROLLOUT_LOCAL_PROB = 0.8 # chance of the threat policy to play next to a chess
+ROLLOUT_PROXIMITY_WEIGHT = 4 # extra weight per chess around a position in the weighted policy
 
+
+def board_size_settings(size):
+    '''
+    The settings derived from the board size, computed as above
+    '''
+    return {'board_size': size, 'CANDIDATE_RADIUS': 1 if size < 15 else 2, 'CONFIDENT': max(6/size-0.5, 0.25)}
+
+
+def set_board_size(size):
+    '''
+    Set the board size and the settings derived from it
+    '''
+    globals().update(board_size_settings(size))
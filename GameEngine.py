@@ -3,7 +3,6 @@ from queue import Queue
 
 import pygame
 import multiprocessing
-from copy import deepcopy
 
 import Config
 from AI import AI
@@ -20,6 +19,10 @@ class GameEngine(object):
         Game Engine Setting
         '''
         self.board_size = Config.board_size
+        # Board geometry derived from the window size
+        self.margin = 40
+        self.grid = (Config.windows_size[0] - 2*self.margin)/(self.board_size-1)
+        self.stone_radius = int(min(18, 0.45*self.grid))
         self.screen = None
         self.is_quit = False
         self.mouse_position = None
@@ -37,7 +40,10 @@ class GameEngine(object):
         '''
         self.turn = Config.FIRST
         self.signal = multiprocessing.Queue(1)
-        self.ai_process = None
+        self.ai_service = None
+        self.ai_requests = multiprocessing.Queue()
+        self.ai_cancel = multiprocessing.Event()
+        self.ai_requested = False
         self.check_board = False
         self.is_over = False
         self.winner = None
@@ -80,6 +86,7 @@ class GameEngine(object):
 
             if event.type == pygame.QUIT:
                 self.is_quit = True
+                self.stop_AI()
                 pygame.quit()
                 # exit()
                 
@@ -114,24 +121,57 @@ class GameEngine(object):
                     # Initialize the ai process
                     print('AI process end!')
                     self.ai.position = self.signal.get() # pass the position
-                    self.ai_process.terminate()
-                    self.ai_process.join()
-                    self.ai_process = None
+                    self.ai_requested = False
                     self.update_AI()
                     self.turn = Config.HUMAN
                     self.check_board = True
             else:
-                if not self.ai_process:
-                    print('AI process start!')
-                    self.signal.put(Config.AI_THREAD_WORK)
-                    self.ai_process = multiprocessing.Process(target = self.ai.choose_position, 
-                        args=(deepcopy(self.board), self.human.id, self.human.last_position, self.signal,))
-                    self.ai_process.start()
+                self.__request_AI()
 
         if self.check_board:
             self.check_game_result()
 
 
+    def __request_AI(self):
+        '''
+        Ask the AI service for a position
+        The service process is started once and keeps its search tree between turns
+        '''
+        if self.ai_requested:
+            return
+        if not self.ai_service:
+            print('AI service start!')
+            self.ai_service = multiprocessing.Process(target = self.ai.search_service, 
+                args=(self.ai_requests, self.signal, self.ai_cancel,), daemon=True)
+            self.ai_service.start()
+        self.ai_requests.put((self.board.copy(), self.human.id, self.human.last_position))
+        self.ai_requested = True
+
+
+    def cancel_AI(self):
+        '''
+        Abandon the pending request or the pondering of the AI service, no position is answered
+        '''
+        self.ai_cancel.set()
+        while not self.signal.empty():
+            self.signal.get()
+        self.ai_requested = False
+
+
+    def stop_AI(self):
+        '''
+        Cancel the search and end the AI service
+        '''
+        if not self.ai_service:
+            return
+        self.cancel_AI()
+        self.ai_requests.put(None)
+        self.ai_service.join(1)
+        if self.ai_service.is_alive():
+            self.ai_service.terminate()
+        self.ai_service = None
+
+
     def check_game_result(self):
         '''
         Check the game result
@@ -143,15 +183,11 @@ class GameEngine(object):
             self.turn = None
 
     
-    def update_AI(self, signal=None):
+    def update_AI(self):
         '''
-        Run the MCTS in another thread
+        Play the position answered by the AI service
         '''
-        if self.ai_process:
-            pass
-            # self.ai.choose_position(deepcopy(self.board), self.human.id, self.human.last_position, signal)
-        else:
-            self.board.move(self.ai.position, self.ai.id)
+        self.board.move(self.ai.position, self.ai.id)
 
 
     def update_human(self):
@@ -163,10 +199,11 @@ class GameEngine(object):
         err_msg = 'The position is not available.'
         if self.mouse_position:
             (x,y) = self.mouse_position
-            d = int(560/(self.board_size-1))
-            row = round((y - 40) / d)
-            col = round((x - 40) / d)
-            move_success = self.board.move((row, col), self.human.id)
+            d = self.grid
+            row = round((y - self.margin) / d)
+            col = round((x - self.margin) / d)
+            if 0 <= row < self.board_size and 0 <= col < self.board_size:
+                move_success = self.board.move((row, col), self.human.id)
             if move_success:
                 self.human.last_position = (row, col)
             self.mouse_position = None
@@ -180,14 +217,16 @@ class GameEngine(object):
         input: game windows
         output: none
         """
-        d = int(560/(self.board_size-1))
+        d = self.grid
+        m = self.margin
+        end = m + d*(self.board_size-1)
         black_color = [0, 0, 0]
         board_color = [255, 222, 173]
         screen.fill(board_color)
         
         for h in range(0, self.board_size):
-            pygame.draw.line(screen, black_color, [40, h * d+40], [600, 40+h * d], 1)
-            pygame.draw.line(screen, black_color, [40+d*h, 40], [40+d*h, 600], 1)
+            pygame.draw.line(screen, black_color, [m, h * d+m], [end, m+h * d], 1)
+            pygame.draw.line(screen, black_color, [m+d*h, m], [m+d*h, end], 1)
 
 
     def draw_stone(self, screen, mat):
@@ -202,15 +241,16 @@ class GameEngine(object):
         """
         black_color = [0, 0, 0]
         white_color = [255, 255, 255]
-        d = int(560/(self.board_size-1))
+        d = self.grid
+        m = self.margin
         for i in range(mat.shape[0]):
             for j in range(mat.shape[1]):
                 if mat[i][j] == 1:
-                    pos = [40+d*j, 40+d*i]
-                    pygame.draw.circle(screen, black_color, pos, 18,0)
+                    pos = [round(m+d*j), round(m+d*i)]
+                    pygame.draw.circle(screen, black_color, pos, self.stone_radius,0)
                 elif mat[i][j] == -1:
-                    pos = [40+d*j, 40+d*i]
-                    pygame.draw.circle(screen, white_color, pos, 18,0)
+                    pos = [round(m+d*j), round(m+d*i)]
+                    pygame.draw.circle(screen, white_color, pos, self.stone_radius,0)
 
 
     def __render(self):
@@ -245,5 +285,5 @@ class GameEngine(object):
         else:
             text_surf = font.render('Game Over! A Tie!',True,font_color)
         text_rect = text_surf.get_rect()
-        text_rect.center = (320,320)
+        text_rect.center = (Config.windows_size[0]//2, Config.windows_size[1]//2)
         screen.blit(text_surf, text_rect)
\ No newline at end of file
@@ -2,14 +2,40 @@ import numpy as np
 import pandas as pd 
 import time
 import random
+import threading
+import warnings
+import cProfile
+import pstats
 
-from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor, wait
 
 from MCTSNode import MCTSNode
-from Board import Board
+from BatchRollout import BatchRollout
+from Board import new_board
+from TranspositionTable import TranspositionTable
+from ArrayTree import ArrayTree
+from RolloutPolicy import new_policy
+from SearchStats import SearchStats
+from OpeningBook import load_book
+from StatsCache import load_cache
 import Config
 
-max_workers=4
+max_workers = Config.MAX_WORKERS
+
+
+def root_search_worker(board, last_player, last_position, max_decision_time, max_simulation_times, seed):
+    '''
+    Build an independent tree in a worker process
+    Return the reason of the stop and the statistics of the root children 
+    as (position, win_times, visited_times, proven, wins at once)
+    '''
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    mcts = MCTS(board, max_decision_time, max_simulation_times)
+    root = mcts.new_root(last_player, last_position)
+    mcts.monte_carlo_tree_search(root)
+    return mcts.stop_reason, [(child.position, child.win_times, child.visited_times, child.proven, 
+        child.winner == child.player) for child in root.children]
 
 class MCTS(object):
     '''
@@ -17,117 +43,619 @@ class MCTS(object):
     '''
 
     def __init__(self, board, max_decision_time, max_simulation_times):
-        self.board =  Board(board.state, board.n_in_row) # Chess board
+        self.board = new_board(board.state, board.n_in_row) # Chess board
         self.max_decision_time = max_decision_time
         self.max_simulation_times = max_simulation_times
 
         self.confident = Config.CONFIDENT # the constant in UCT score function
         self.simulation_times = 0 # the times of simulation
-        self.begin_time = time.time() # start the MCTS time
+        self.begin_time = time.perf_counter() # start the MCTS time
+        self.stop_reason = None # why the last search stopped
+        self.root = None # the subtree kept for the next turn
+        self.root_visited_times = 0 # the visited times of the root before the search
+
+        self.stats = SearchStats() # the statistics of the last search
+        self.stats_callback = None # called with the live stats every Config.STATS_INTERVAL seconds
+        self.profiling = False
+        self.cancel = None # an Event, the search stops as soon as it is set
+
+        self.book = load_book(Config.OPENING_BOOK)
+        self.policy = new_policy(Config.ROLLOUT_POLICY)
+        self.batch_rollout = None
+        batch_size = Config.LEAF_BATCH_SIZE
+        if Config.SEARCH_MODE == 'tree' and batch_size <= 1:
+            # The Python rollouts hold the GIL, the threads of the tree search only overlap in numpy
+            warnings.warn('SEARCH_MODE tree runs batched rollouts, LEAF_BATCH_SIZE {} is replaced by TREE_LEAF_BATCH_SIZE {}'
+                .format(batch_size, Config.TREE_LEAF_BATCH_SIZE))
+            batch_size = Config.TREE_LEAF_BATCH_SIZE
+        if batch_size > 1:
+            self.batch_rollout = BatchRollout(self.board.n_in_row, batch_size)
 
     
+    def update_board(self, board):
+        '''
+        Set the board of the next turn and restart the budget, the kept subtree is left untouched
+        '''
+        self.board = new_board(board.state, board.n_in_row)
+        self.simulation_times = 0
+        self.begin_time = time.perf_counter()
+
+
     def choose_position(self, last_player, last_position):
         '''
         Choose a position
         '''
+        self.stop_reason = None
         # One availables position left in the board
         if len(self.board.availables) == 1:
             return self.board.availables[0]
-        root = MCTSNode(deepcopy(self.board), last_player, None, last_position)  # root is the current state of board
-        position = self.monte_carlo_tree_search(root).position
+        if self.book is not None:
+            position = self.book.lookup(self.board)
+            if position is not None:
+                print('Opening book: {}'.format(position))
+                self.stop_reason, self.root = 'book', None
+                return position
+        if Config.PROFILE_DECISION and not self.profiling:
+            return self.profile_decision(last_player, last_position)[0]
+        if Config.SEARCH_MODE == 'root':
+            return self.root_parallel_search(last_player, last_position)
+        if Config.TREE_STORAGE == 'array':
+            return self.array_tree_search(last_player, last_position)
+        root = self.reuse_root(last_player, last_position)
+        if root is None:
+            root = self.new_root(last_player, last_position)
+        if Config.SEARCH_MODE == 'tree':
+            best_child = self.tree_parallel_search(root)
+        else:
+            best_child = self.monte_carlo_tree_search(root)
+        if root.cache is not None:
+            self.save_stats(root)
+        if Config.REUSE_TREE:
+            self.root = best_child
+        return best_child.position
+
+
+    def save_stats(self, root):
+        '''
+        Add the visits and wins learned since the last save to the statistics cache,
+        for the nodes with at least Config.STATS_CACHE_MIN_VISITS new visits
+        The statistics shared by transposed nodes are saved once, the subtrees of all of them are walked
+        '''
+        rows = []
+        saved = set()
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            stats = node.stats
+            if id(stats) in saved:
+                nodes.extend(node.children)
+                continue
+            visits = stats.visited_times - stats.prior_visits
+            if visits < Config.STATS_CACHE_MIN_VISITS:
+                continue
+            rows.append((node.board.state, visits, stats.win_times - stats.prior_wins))
+            saved.add(id(stats))
+            stats.prior_visits, stats.prior_wins = stats.visited_times, stats.win_times
+            nodes.extend(node.children)
+        root.cache.add(rows)
+
+
+    def profile_decision(self, last_player, last_position, top=20):
+        '''
+        Run one decision under cProfile and print the top functions by cumulative time
+        output: position, pstats.Stats
+        '''
+        profiler = cProfile.Profile()
+        self.profiling = True
+        try:
+            position = profiler.runcall(self.choose_position, last_player, last_position)
+        finally:
+            self.profiling = False
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative').print_stats(top)
+        return position, stats
+
+
+    def new_root(self, last_player, last_position):
+        '''
+        Build the root node of the current board
+        '''
+        root = MCTSNode(self.board.copy(), last_player, None, last_position)  # root is the current state of board
+        if Config.TRANSPOSITION_TABLE:
+            root.table = TranspositionTable(Config.TT_SIZE)
+        root.cache = load_cache(Config.STATS_CACHE, Config.STATS_CACHE_SIZE)
+        return root
+
+
+    def reuse_root(self, last_player, last_position):
+        '''
+        Promote the child of the kept subtree that matches the last move of the opponent
+        Return None if the subtree does not lead to the current board
+        '''
+        root, self.root = self.root, None
+        if root is None:
+            return None
+        for child in root.children:
+            if child.position == last_position and child.player == last_player \
+                and np.array_equal(child.board.state, self.board.state):
+                child.detach()
+                print('Reuse the subtree with {} visits'.format(child.visited_times))
+                return child
+        return None
+
+
+    def ponder(self, interrupted):
+        '''
+        Search the kept subtree on the opponent's time, until interrupted() or self.cancel,
+        up to Config.PONDER_SIMULATIONS simulations or a proven root
+        The next choose_position reuses the child of the move the opponent played
+        The statistics of the last search are kept, the ponder counts into its own
+        Return the simulation times
+        '''
+        root = self.root
+        if root is None:
+            return 0
+        root.detach()
+        visited_times = root.visited_times
+        stats, self.stats = self.stats, SearchStats()
+        try:
+            while root.visited_times - visited_times < Config.PONDER_SIMULATIONS \
+                and root.proven is None and not self.is_terminal(root) \
+                and not interrupted() and not (self.cancel is not None and self.cancel.is_set()):
+                leaf = self.traverse(root)
+                if self.batch_rollout:
+                    self.backpropagate_batch(leaf, self.rollout_batch(leaf))
+                else:
+                    self.backpropagate(leaf, self.rollout(leaf))
+                if Config.SOLVER:
+                    self.solve(leaf)
+        finally:
+            self.stats = stats
+        print('Ponder Times: {}'.format(root.visited_times - visited_times))
+        return root.visited_times - visited_times
+
+
+    def root_parallel_search(self, last_player, last_position):
+        '''
+        Root parallelization
+        Every worker searches its own tree with a different seed,
+        the root children statistics are merged and the most visited position is chosen.
+        A position proven to win by any worker is played at once, the positions proven to lose are avoided.
+        When self.cancel is set, return None at once and leave the workers to run out of time
+        '''
+        time_left = self.max_decision_time - (time.perf_counter() - self.begin_time)
+        seed = random.randrange(2**32)
+        merged = {}
+        reasons = []
+        won, lost = set(), set()
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        futures = [executor.submit(root_search_worker, self.board, last_player, last_position, 
+            time_left, self.max_simulation_times, seed+i) for i in range(max_workers)]
+        pending = futures
+        while pending:
+            if self.cancel is not None and self.cancel.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.stop_reason = 'cancelled'
+                return None
+            pending = wait(pending, timeout=0.05)[1]
+        executor.shutdown()
+        for future in futures:
+            reason, children = future.result()
+            reasons.append(reason)
+            for position, win_times, visited_times, proven, wins in children:
+                stats = merged.setdefault(position, [0, 0])
+                stats[0] += win_times
+                stats[1] += visited_times
+                if wins or proven == 1:
+                    won.add(position)
+                elif proven == -1:
+                    lost.add(position)
+        self.simulation_times = sum(stats[1] for stats in merged.values())
+        print('Simulation Times: {}'.format(self.simulation_times))
+        if won:
+            self.stop_reason = 'proven win'
+            position = max(won, key=lambda position: merged[position][1])
+        else:
+            candidates = {position: stats for position, stats in merged.items() if position not in lost}
+            # The proofs of a worker may not hold for the merged children
+            reasons = [reason for reason in reasons if reason not in ('proven win', 'proven loss')]
+            if candidates:
+                self.stop_reason = max(set(reasons), key=reasons.count) if reasons else 'decided'
+            else:
+                # Every position is a proven loss, the most visited one resists the longest
+                self.stop_reason, candidates = 'proven loss', merged
+            position = max(candidates.items(), key=lambda x: (x[1][1], x[1][0]))[0]
+        print('Stop reason: {}'.format(self.stop_reason))
         return position
         
 
+    def array_tree_search(self, last_player, last_position):
+        '''
+        MCTS process on the struct-of-arrays tree
+        The moves of the selected path are played on one board and undone after the backpropagation
+        '''
+        time_mcts = time.time()
+        tree = ArrayTree(self.board.copy(), last_player, last_position)
+        board = tree.board
+        while self.resources_left():
+            leaf, depth = tree.select(self.confident)
+            player = int(tree.player[leaf])
+            if self.batch_rollout:
+                is_over, winner = board.check_game_result()
+                if is_over:
+                    simulation_results = {winner: self.batch_rollout.batch_size}
+                else:
+                    simulation_results = self.batch_rollout.run(board.state, player)
+            else:
+                simulation_results = {self.playout(board, player): 1}
+            tree.backpropagate(leaf, simulation_results)
+            for _ in range(depth):
+                board.undo_move()
+            self.simulation_times = int(tree.visited_times[tree.root])
+        print('Simulation Times: {}'.format(self.simulation_times))
+        print('Simulation time: {}'.format(time.time()-time_mcts))
+        print('Tree nodes: {} ({} bytes)'.format(tree.size, tree.nbytes()))
+        return tree.position(tree.best_child(self.confident))
+
+
+    def tree_parallel_search(self, root):
+        '''
+        Tree parallelization
+        Several threads descend the same tree, a virtual loss on the selected path spreads them over different branches
+        '''
+        time_mcts = time.time()
+        self.root_visited_times = root.visited_times
+        self.stats = SearchStats()
+        lock = threading.Lock()
+        workers = [threading.Thread(target=self.tree_worker, args=(root, lock)) for _ in range(max_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed_time = time.time()-time_mcts
+        self.stats.finish(root, self.simulation_times, elapsed_time, self.stop_reason)
+        print('Simulation Times: {}'.format(self.simulation_times))
+        print('Simulation time: {}'.format(elapsed_time))
+        print('Stop reason: {}'.format(self.stop_reason))
+        return self.best_child(root)
+
+
+    def tree_worker(self, root, lock):
+        '''
+        One worker of the tree parallelization
+        The tree and the stats are only touched under the lock, the rollout runs on a copy of the leaf board
+        '''
+        while self.resources_left(root):
+            with lock:
+                # Another worker may have decided the search since the check
+                if not self.resources_left(root):
+                    break
+                leaf = self.traverse(root)
+                self.add_virtual_loss(leaf)
+                board = leaf.board_copy()
+            if self.batch_rollout:
+                if board.is_over:
+                    simulation_results = {board.winner: self.batch_rollout.batch_size}
+                else:
+                    simulation_results = self.batch_rollout.run(board.state, leaf.player)
+            else:
+                simulation_result, depth = self.simulate(board, leaf.player)
+            with lock:
+                self.remove_virtual_loss(leaf)
+                if self.batch_rollout:
+                    self.stats.rollouts += self.batch_rollout.batch_size
+                    self.backpropagate_batch(leaf, simulation_results)
+                else:
+                    self.stats.rollouts += 1
+                    self.stats.rollout_moves += depth
+                    self.backpropagate(leaf, simulation_result)
+                if Config.SOLVER:
+                    self.solve(leaf)
+                self.simulation_times = root.visited_times - self.root_visited_times
+
+
+    def add_virtual_loss(self, node):
+        '''
+        Count a pending playout as a loss on the path from the node to the root
+        '''
+        while node is not None:
+            node.virtual_loss += Config.VIRTUAL_LOSS
+            node = node.parent
+
+
+    def remove_virtual_loss(self, node):
+        '''
+        Remove the virtual loss when the real result arrives
+        '''
+        while node is not None:
+            node.virtual_loss -= Config.VIRTUAL_LOSS
+            node = node.parent
+
+
     def monte_carlo_tree_search(self, root):
         '''
         MCTS process
         '''
         time_mcts = time.time()
-        while self.resources_left():
+        self.root_visited_times = root.visited_times
+        stats = self.stats = SearchStats()
+        next_callback = time_mcts + Config.STATS_INTERVAL
+        while self.resources_left(root):
+            begin = time.perf_counter()
             leaf = self.traverse(root)         # leaf is unvisited node
-            simulation_result = self.rollout(leaf)
-            self.backpropagate(leaf, simulation_result)
-            self.simulation_times = root.visited_times
+            traversed = time.perf_counter()
+            if self.batch_rollout:
+                simulation_results = self.rollout_batch(leaf)
+                rolled_out = time.perf_counter()
+                self.backpropagate_batch(leaf, simulation_results)
+            else:
+                simulation_result = self.rollout(leaf)
+                rolled_out = time.perf_counter()
+                self.backpropagate(leaf, simulation_result)
+            if Config.SOLVER:
+                self.solve(leaf)
+            end = time.perf_counter()
+            stats.traverse_time += traversed - begin
+            stats.rollout_time += rolled_out - traversed
+            stats.backpropagate_time += end - rolled_out
+            self.simulation_times = root.visited_times - self.root_visited_times
+            if self.stats_callback and time.time() >= next_callback:
+                stats.simulations, stats.elapsed_time = self.simulation_times, time.time() - time_mcts
+                self.stats_callback(stats)
+                next_callback += Config.STATS_INTERVAL
         # root.show_MCTS()
+        # The expansions are timed inside traverse
+        stats.traverse_time -= stats.expand_time
+        elapsed_time = time.time()-time_mcts
+        stats.finish(root, self.simulation_times, elapsed_time, self.stop_reason)
         print('Simulation Times: {}'.format(self.simulation_times))
-        print('Simulation time: {}'.format(time.time()-time_mcts))
-        return root.get_best_child(self.uct)
+        print('Simulation time: {}'.format(elapsed_time))
+        print('Stop reason: {}'.format(self.stop_reason))
+        return self.best_child(root)
     
 
     def backpropagate(self, node, result):
         '''
         Back propagate the result. 
-        Update win times and visited times
+        Update win times and visited times from the node up to the root
         '''
-        if node.player == result:
-            node.win_times += 1
-        elif result == None:
-            node.win_times += 0.1
-        else:
-            node.win_times += -0.2
-        node.visited_times += 1
-        if node.parent == None:
-            # The node is a root
-            return
-        self.backpropagate(node.parent, result)
+        while node is not None:
+            if node.player == result:
+                node.win_times += 1
+            elif result == None:
+                node.win_times += 0.1
+            else:
+                node.win_times += -0.2
+            node.visited_times += 1
+            node = node.parent
+
+
+    def backpropagate_batch(self, node, results):
+        '''
+        Back propagate the counts of a batch of results in one step.
+        results: {winner: count}, the draws are counted under None
+        '''
+        visits = sum(results.values())
+        while node is not None:
+            node.win_times += results.get(node.player, 0) + 0.1*results.get(None, 0) \
+                - 0.2*results.get(-1*node.player, 0)
+            node.visited_times += visits
+            node = node.parent
+
+
+    def solve(self, node):
+        '''
+        MCTS-Solver: mark the proven nodes from the node up to the root
+        A terminal node is a win of its player,
+        a node with a winning child is a loss,
+        a node whose candidate moves (one per symmetry class) are all expanded and all losses is a win
+        '''
+        if node.proven is None:
+            if node.winner != node.player:
+                return
+            node.proven = 1
+        parent = node.parent
+        while parent is not None and parent.proven is None:
+            if any(child.proven == 1 for child in parent.children):
+                parent.proven = -1
+            elif parent.peek_untried_action() is None \
+                and all(child.proven == -1 for child in parent.children):
+                parent.proven = 1
+            else:
+                return
+            parent = parent.parent
+
+
+    def rollout_batch(self, node):
+        '''
+        Simulate a batch of games from the node with numpy
+        '''
+        self.stats.rollouts += self.batch_rollout.batch_size
+        if node.is_over:
+            return {node.winner: self.batch_rollout.batch_size}
+        if node.materialized:
+            return self.batch_rollout.run(node.board.state, node.player)
+        board = node.parent.board
+        board.move(node.position, node.player)
+        results = self.batch_rollout.run(board.state, node.player)
+        board.undo_move()
+        return results
 
 
     def rollout(self, node):
         '''
         Simulate a game up to game over
+        The moves are played on the board of the node and undone afterwards, so no copy is made
+        A node without its own board plays from the board of the parent with its move played
         '''
-        current_state = deepcopy(node.board)
-        player = node.player
+        if node.materialized:
+            return self.playout(node.board, node.player)
+        board = node.parent.board
+        board.move(node.position, node.player)
+        winner = self.playout(board, node.player)
+        board.undo_move()
+        return winner
+
+
+    def playout(self, current_state, player):
+        '''
+        Play the moves of the rollout policy on the board after the player up to game over, then undo them
+        The rollout is counted in the stats
+        '''
+        winner, depth = self.simulate(current_state, player)
+        self.stats.rollouts += 1
+        self.stats.rollout_moves += depth
+        return winner
+
+
+    def simulate(self, current_state, player):
+        '''
+        The playout without the stats
+        output: winner, the number of moves played
+        '''
+        depth = 0
         is_over, winner = current_state.check_game_result()
         while not is_over:
             player = -1*player
-            position = self.rollout_policy(current_state)
+            position = self.rollout_policy(current_state, player)
             current_state.move(position, player)
+            depth += 1
             is_over, winner = current_state.check_game_result()
-        return winner
+        for _ in range(depth):
+            current_state.undo_move()
+        return winner, depth
 
 
     def is_terminal(self, node):
         '''
         Wether the node is terminal, which means someone win or no availables position.
         '''
-        is_terminal, _ = node.board.check_game_result()
-        return is_terminal
+        return node.is_over
 
 
-    def rollout_policy(self, board):
+    def rollout_policy(self, board, player):
         '''
-        Random positions.
+        The position of the player chosen by the policy of Config.ROLLOUT_POLICY
         '''
-        return random.choice(board.availables)
+        return self.policy(board, player)
 
 
     def traverse(self, node):
         '''
         Traverse all the nodes and find the node that is not fully expeanded.
+        A node proven by the solver is returned like a terminal node
 
         (For the traverse function, to avoid using up too much time or resources, you may start considering only 
         a subset of children (e.g 10 children). Increase this number or by choosing this subset smartly later.)
         '''
-        while not self.is_terminal(node):
+        while not self.is_terminal(node) and node.proven is None:
             if not node.fully_expanded():
-                return node.expand_child()
+                return self.expand(node)
             else:
-                node = node.get_best_child(self.uct)
+                child = self.select_child(node)
+                if child is None:
+                    if node.peek_untried_action() is None:
+                        return node
+                    # All the children are proven losses, try one more move
+                    node.max_expend_num += 1
+                    return self.expand(node)
+                node = child
         return node
 
 
-    def resources_left(self):
+    def expand(self, node):
+        '''
+        Add a child to the node, timed in the stats
+        '''
+        begin = time.perf_counter()
+        child = node.expand_child()
+        self.stats.expand_time += time.perf_counter() - begin
+        return child
+
+
+    def select_child(self, node):
+        '''
+        The child chosen by the tree policy of Config.TREE_POLICY
+        With Config.SOLVER the children proven to lose are skipped, None if no child is left
+        '''
+        if Config.TREE_POLICY == 'fast_uct':
+            return node.get_best_child_fast(self.confident, Config.SOLVER)
+        if Config.SOLVER:
+            return node.get_best_unsolved_child(self.uct)
+        return node.get_best_child(self.uct)
+
+
+    def resources_left(self, root=None):
         '''
         Wether the resources left
+        With the root and Config.EARLY_STOP, also stop once the search is decided
+        Stop at once when self.cancel is set
+        The reason of the stop is kept in self.stop_reason
+        '''
+        if self.cancel is not None and self.cancel.is_set():
+            self.stop_reason = 'cancelled'
+            return False
+        elapsed_time = time.perf_counter() - self.begin_time
+        if elapsed_time >= self.max_decision_time:
+            self.stop_reason = 'time'
+            return False
+        if self.simulation_times >= self.max_simulation_times:
+            self.stop_reason = 'simulations'
+            return False
+        if root is not None and (Config.EARLY_STOP or Config.SOLVER):
+            reason = self.search_decided(root, elapsed_time)
+            if reason:
+                self.stop_reason = reason
+                return False
+        return True
+
+
+    def search_decided(self, root, elapsed_time):
+        '''
+        Any-time controller
+        'proven win': a child of the root wins the game, or is proven to win by the solver
+        'proven loss': the solver proved that every move of the root loses
+        'decided': the most visited child of the root not proven to lose can not be overtaken 
+                   with the simulations left, estimated from the simulation rate so far
+        '''
+        for child in root.children:
+            if child.winner == child.player or child.proven == 1:
+                return 'proven win'
+        if root.proven == 1:
+            return 'proven loss'
+        children = [child for child in root.children if child.proven != -1]
+        if not Config.EARLY_STOP or len(children) < 2 or not root.fully_expanded() or self.simulation_times == 0 \
+            or elapsed_time <= 0:
+            return None
+        visited_times = sorted((child.visited_times for child in children), reverse=True)
+        time_left = self.max_decision_time - elapsed_time
+        simulations_left = min(self.max_simulation_times - self.simulation_times, 
+            self.simulation_times/elapsed_time*time_left)
+        if visited_times[0] - visited_times[1] > simulations_left:
+            return 'decided'
+        return None
+
+
+    def best_child(self, root):
+        '''
+        The child to play: the winning child or the most visited one when the search stopped early,
+        else the best one by the score function, avoiding the proven losses
         '''
-        isLeft = ((time.time() - self.begin_time) < self.max_decision_time) \
-            and (self.simulation_times < self.max_simulation_times)
-        return isLeft
+        if self.stop_reason == 'proven win':
+            return next(child for child in root.children if child.winner == child.player or child.proven == 1)
+        if self.stop_reason in ('decided', 'proven loss'):
+            # Every child is a proven loss after 'proven loss', then the most visited one resists the longest
+            children = [child for child in root.children if child.proven != -1] or root.children
+            return max(children, key=lambda child: child.visited_times)
+        return self.select_child(root) or root.get_best_child(self.uct)
 
 
     def uct(self, node):
         '''
         Score function
+        A pending playout of another worker counts as a visit lost (virtual loss)
         '''
-        return (node.win_times/node.visited_times) + self.confident*np.sqrt(np.log(node.parent.visited_times)/node.visited_times)
+        visited_times = node.visited_times + node.virtual_loss
+        win_times = node.win_times - node.virtual_loss
+        parent_visited_times = node.parent.visited_times + node.parent.virtual_loss
+        return (win_times/visited_times) + self.confident*np.sqrt(np.log(parent_visited_times)/visited_times)
@@ -1,56 +1,209 @@
+import math
 import random
+import numpy as np
 from queue import Queue
-from copy import deepcopy
-from Board import Board
+from collections import deque
 import Config
+from Board import stabilizer
 from Sprite import Sprite
 
+class NodeStats(object):
+    '''
+    The statistics of a node, shared by the transposed nodes of the same position
+    The prior is the part already in the statistics cache
+    '''
+    __slots__ = ('win_times', 'visited_times', 'prior_wins', 'prior_visits')
+
+    def __init__(self):
+        self.win_times = 0
+        self.visited_times = 0
+        self.prior_wins = 0
+        self.prior_visits = 0
+
+
 class MCTSNode(object):
     '''
     MCTSNode in the MCT
     '''
     
     def __init__(self, board, player, parent, position):
-        self.board = board
+        '''
+        board: the board of the node, or None to build it from the parent on the first use
+        '''
+        self._board = board
+        self.key = None # Zobrist hash of the position when the transposition table is used
         self.player = player
         self.parent = parent
         self.position = position
 
+        # Transposition table of the tree, None if the statistics are not shared
+        self.table = parent.table if parent is not None else None
+        # Statistics cache on disk, None if the nodes start cold
+        self.cache = parent.cache if parent is not None else None
+
         self.children = []
 
-        # Max children number
+        # Max children number, with progressive widening every move can be reached
         self.max_expend_num = Config.CHILDREN_NUM
-        if len(board.availables) < self.max_expend_num:
-            self.max_expend_num = len(board.availables)
+        if board is None:
+            # Play the move on the parent board and undo it, no board is allocated
+            parent_board = parent.board
+            parent_board.move(position, player)
+            self.is_over, self.winner = parent_board.check_game_result()
+            availables_num = len(parent_board.availables)
+            parent_board.undo_move()
+        else:
+            self.is_over, self.winner = board.check_game_result()
+            availables_num = len(board.availables)
+        if availables_num < self.max_expend_num or Config.PROGRESSIVE_WIDENING:
+            self.max_expend_num = availables_num
 
-        self.win_times = 0
-        self.visited_times = 0
+        self.stats = NodeStats()
+        self.virtual_loss = 0 # pending playouts of the tree-parallel workers
+        self.proven = None # MCTS-Solver: 1 proven win of the player, -1 proven loss
 
-        self._untried_actions = None
-        self._untried_far_actions = []
+        self._candidates = None # generator of the untried positions in priority order
+        self._untried_actions = deque() # the positions generated and not tried yet
     
 
+    @property
+    def board(self):
+        '''
+        The board of the node, built when first used:
+        shared with the node of the same position in the transposition table if it has one, else copied from the parent
+        '''
+        if self._board is None:
+            if self.table is not None:
+                source = self.table.peek(self.key)
+                if source is not None and source._board is not None:
+                    self._board = source._board
+                    return self._board
+            board = self.parent.board.copy()
+            board.move(self.position, self.player)
+            self._board = board
+        return self._board
+
+
+    @property
+    def materialized(self):
+        '''
+        Wether the node has its own board
+        '''
+        return self._board is not None
+
+
+    def board_copy(self):
+        '''
+        A copy of the board of the node, the node itself does not keep a board
+        '''
+        if self._board is not None:
+            return self._board.copy()
+        board = self.parent.board.copy()
+        board.move(self.position, self.player)
+        return board
+
+
+    def detach(self):
+        '''
+        Make the node a root: build its board before dropping the parent
+        '''
+        self.board
+        self.parent = None
+
+
+    @property
+    def win_times(self):
+        return self.stats.win_times
+
+
+    @win_times.setter
+    def win_times(self, value):
+        self.stats.win_times = value
+
+
+    @property
+    def visited_times(self):
+        return self.stats.visited_times
+
+
+    @visited_times.setter
+    def visited_times(self, value):
+        self.stats.visited_times = value
+
+
+    def candidate_positions(self):
+        '''
+        Generate the positions to try in priority order: pattern, nearest (most chess around first), 
+        small board, then the remaining availables
+        Every position is generated once, with Config.SYMMETRY_PRUNING only one per symmetry class
+        Each stage is computed when reached, on the board of the node
+        '''
+        board = self.board
+        width = board.state.shape[1]
+        maps = stabilizer(board.state) if Config.SYMMETRY_PRUNING else []
+        seen = set()
+        stages = (self.find_naive_pattern, self.find_nearest_position_first, self.small_board_strategy, 
+            lambda: list(board.availables))
+        for stage in stages:
+            for x,y in stage():
+                cell = x*width+y
+                if cell in seen or board.state[x, y] != 0:
+                    continue
+                seen.add(cell)
+                seen.update(int(inverse[cell]) for inverse in maps)
+                yield (x,y)
+
+
+    def peek_untried_action(self):
+        '''
+        The next position to try without taking it, None if all the positions are tried
+        '''
+        if not self._untried_actions:
+            if self._candidates is None:
+                self._candidates = self.candidate_positions()
+            position = next(self._candidates, None)
+            if position is None:
+                return None
+            self._untried_actions.append(position)
+        return self._untried_actions[0]
+
+
+    def next_untried_action(self):
+        '''
+        Take the next position to try, None if all the positions are tried
+        '''
+        position = self.peek_untried_action()
+        if position is not None:
+            self._untried_actions.popleft()
+        return position
+
+
     @property
     def untried_actions(self):
-        if self._untried_actions is None:
-            # pattern_children = list((set(self.board.unavailables)|set(self.find_naive_pattern()))-set(self.board.unavailables))
-            pattern_children = self.find_naive_pattern()
-            nearest_children = list(set(self.find_nearest_position_first()) - set(pattern_children))
-            small_board_children = list(set(self.small_board_strategy())-set(pattern_children)-set(nearest_children))
-            available_children = list(set(deepcopy(self.board.availables)) - set(pattern_children) - set(nearest_children) \
-                -set(small_board_children))
-            self._untried_actions = pattern_children + nearest_children + small_board_children + available_children
-            # available_children = deepcopy(self.board.availables)
-            # self._untried_actions = available_children
-
-        return self._untried_actions
-        
+        '''
+        All the positions not tried yet, the generator is run to the end
+        '''
+        if self.peek_untried_action() is not None:
+            self._untried_actions.extend(self._candidates)
+        return list(self._untried_actions)
+
 
     def fully_expanded(self):
         '''
         Wether the node is fully expanded
+        With Config.PROGRESSIVE_WIDENING the node allows k*(n+1)^alpha children after n visits,
+        with Config.SYMMETRY_PRUNING the candidates may run out before the max children number
+        '''
+        return len(self.children) >= self.children_limit() or self.peek_untried_action() is None
+
+
+    def children_limit(self):
+        '''
+        The number of children the node allows now
         '''
-        return len(self.children) == self.max_expend_num
+        if Config.PROGRESSIVE_WIDENING:
+            return min(self.max_expend_num, max(1, int(Config.PW_K*(self.visited_times+1)**Config.PW_ALPHA)))
+        return self.max_expend_num
 
 
     def get_best_child(self, score_method):
@@ -66,20 +219,57 @@ class MCTSNode(object):
         return best_child
 
     
+    def get_best_child_fast(self, confident, skip_proven=False):
+        '''
+        UCT with the log of the parent visits computed once
+        Wide nodes are scored in one numpy step over the children visits and wins,
+        narrow ones in a plain loop which is cheaper than building the arrays
+        '''
+        children = self.children
+        if skip_proven:
+            children = [child for child in children if child.proven != -1]
+        if len(children) == 0:
+            return None
+        explore = confident*math.sqrt(math.log(self.visited_times + self.virtual_loss))
+        if len(children) >= Config.VECTOR_SCORE_MIN:
+            visited_times = np.array([child.visited_times + child.virtual_loss for child in children], dtype=np.float64)
+            win_times = np.array([child.win_times - child.virtual_loss for child in children], dtype=np.float64)
+            return children[int(np.argmax(win_times/visited_times + explore/np.sqrt(visited_times)))]
+        best_child, best_score = None, -math.inf
+        for child in children:
+            stats = child.stats
+            visited_times = stats.visited_times + child.virtual_loss
+            score = (stats.win_times - child.virtual_loss)/visited_times + explore/math.sqrt(visited_times)
+            if score > best_score:
+                best_child, best_score = child, score
+        return best_child
+
+
+    def get_best_unsolved_child(self, score_method):
+        '''
+        The best child by the score method, skipping the children proven to lose
+        Return None if every child is a proven loss
+        '''
+        children = [child for child in self.children if child.proven != -1]
+        if len(children) == 0:
+            return None
+        return max(children, key=score_method)
+
+    
     def expand_child(self):
         '''
         If the node is not a fully expanded node, add a child.
-        The child is a player node different from the parent, and it has a different board
-        The child put a chess in a random position
+        The child is a player node different from the parent, it puts a chess in the next untried position
+        Its board is only built when it is first used, see MCTSNode.board
         '''
         if len(self.children) < self.max_expend_num:
             player = Sprite.change_player(self.player)
-            state = deepcopy(self.board.state)
-            position = self.untried_actions.pop(0)
-            state = Board(state, self.board.n_in_row)
-
-            state.move(position, player)
-            new_child = MCTSNode(state, player, self, position)
+            position = self.next_untried_action()
+            if self.table is not None:
+                return self.expand_transposed_child(position, player)
+            new_child = MCTSNode(None, player, self, position)
+            if self.cache is not None:
+                self.seed_child(new_child)
             self.children.append(new_child)
             return new_child
         else:
@@ -87,6 +277,44 @@ class MCTSNode(object):
             return None
     
 
+    def expand_transposed_child(self, position, player):
+        '''
+        Add a child through the transposition table
+        A position already in the table shares the statistics of the node stored there, and its board once built
+        The child board is built lazily as for the other children
+        '''
+        key = self.board.zobrist_after(position, player)
+        new_child = MCTSNode(None, player, self, position)
+        new_child.key = key
+        source = self.table.get(key)
+        if source is not None:
+            new_child.stats = source.stats
+        else:
+            if self.cache is not None:
+                self.seed_child(new_child)
+            self.table.put(key, new_child)
+        self.children.append(new_child)
+        return new_child
+
+
+    def seed_child(self, child):
+        '''
+        Start the child from its statistics in the cache, scaled down to Config.STATS_CACHE_PRIOR visits
+        The key is read on the board of the node with the move of the child played
+        '''
+        self.board.move(child.position, child.player)
+        entry = self.cache.get(self.board.state)
+        self.board.undo_move()
+        if entry is None:
+            return
+        visits, wins = entry
+        scale = min(1, Config.STATS_CACHE_PRIOR/visits)
+        stats = child.stats
+        stats.prior_visits, stats.prior_wins = visits*scale, wins*scale
+        stats.visited_times += stats.prior_visits
+        stats.win_times += stats.prior_wins
+
+
     def find_naive_pattern(self):
         '''
         Find the pattern in this state
@@ -102,47 +330,25 @@ class MCTSNode(object):
         '''
         unavailables_num = len(self.board.unavailables)
         s_len = int((1/2)*(unavailables_num/2)+7/2)
+        height, width = self.board.state.shape
         # print(s_len)
-        if s_len >= Config.board_size:
+        if s_len >= min(height, width):
             # Small board size equal to the original board size
             return []
-        boundary_gap = int((Config.board_size-s_len)/2)
-        small_board_position = [(boundary_gap+i, boundary_gap+j) for i in range(s_len) for j in range(s_len) \
-            if self.board.state[boundary_gap+i][boundary_gap+j] == 0]
+        gap_x, gap_y = int((height-s_len)/2), int((width-s_len)/2)
+        small_board_position = [(gap_x+i, gap_y+j) for i in range(s_len) for j in range(s_len) \
+            if self.board.state[gap_x+i][gap_y+j] == 0]
         sb_len = len(small_board_position)
         return random.sample(small_board_position, int(sb_len/2))
         
 
     def find_nearest_position_first(self):
         '''
-        The method find nearest position sets
-        '''
-
-        nearest_positions = set() # create a set
-        h, w = self.board.state.shape[0], self.board.state.shape[1]
-        unavailables = self.board.unavailables
-        for i, j in unavailables:
-            # up down right left
-            if i < h - 1:
-                nearest_positions.add((i+1, j))
-            if i > 0:
-                nearest_positions.add((i-1, j))
-            if j < w - 1:
-                nearest_positions.add((i, j+1))
-            if j > 0:
-                nearest_positions.add((i, j-1))
-            # diag
-            if i < h - 1 and j < w - 1:
-                nearest_positions.add((i+1, j+1))
-            if i > 0 and j < w -1:
-                nearest_positions.add((i-1, j+1))
-            if i < h -1 and j > 0:
-                nearest_positions.add((i+1, j-1))
-            if i > 0 and j > 0:
-                nearest_positions.add((i-1, j-1))
-        # remove unavailables in nearest position
-        nearest_positions = list(set(nearest_positions) - set(unavailables))
-        return nearest_positions
+        The method find nearest position sets, the positions with the most chess around first
+        '''
+        counts = self.board.neighbour_counts()
+        width = self.board.state.shape[1]
+        return sorted(self.board.nearest_positions(), key=lambda position: -counts[position[0]*width+position[1]])
 
 
     def show_MCTS(self):
@@ -0,0 +1,142 @@
+'''
+Opening book: canonical position -> best move, precomputed by MCTS with a large budget
+
+python OpeningBook.py --plies 4 --branching 3 --think_time 30 --output opening_book.bin
+
+File layout: header, the sorted position keys (uint64), then one record per key
+The keys and the records are memory-mapped, a lookup reads a few pages only
+'''
+import argparse
+import hashlib
+import os
+import numpy as np
+
+import Config
+from Board import new_board, canonical_form
+
+MAGIC = b'GOMOKUBK'
+header_dtype = np.dtype([('magic', 'S8'), ('height', '<u4'), ('width', '<u4'), ('n_in_row', '<u4'), ('count', '<u4'), 
+    ('reserved', '<u8')])
+record_dtype = np.dtype([('move', '<u2'), ('visits', '<u4'), ('wins', '<f4')])
+
+opening_books = {}
+
+
+def position_key(state):
+    '''
+    The 64 bits key of the canonical state
+    output: key, (permutation, inverse) from the state to the canonical state
+    '''
+    key, symmetry = canonical_form(state)
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little'), symmetry
+
+
+def load_book(path):
+    '''
+    The opening book of the path, opened once per process
+    Return None if there is no book
+    '''
+    if not path or not os.path.exists(path):
+        return None
+    if path not in opening_books:
+        opening_books[path] = OpeningBook(path)
+    return opening_books[path]
+
+
+def write_book(path, height, width, n_in_row, entries):
+    '''
+    Write the entries {key: (canonical cell, visits, wins)} as a sorted binary table
+    '''
+    keys = np.array(sorted(entries), dtype='<u8')
+    records = np.array([entries[int(key)] for key in keys], dtype=record_dtype)
+    header = np.array([(MAGIC, height, width, n_in_row, len(keys), 0)], dtype=header_dtype)
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(keys.tobytes())
+        f.write(records.tobytes())
+
+
+def build_book(path, board_size, n_in_row, plies, branching, think_time, simulation_times):
+    '''
+    Search every position up to plies moves with MCTS, following the best branching moves of every search,
+    and write the best move of every position
+    The positions are keyed by their canonical form, so the symmetric positions are searched once
+    '''
+    Config.set_board_size(board_size)
+    Config.OPENING_BOOK = None
+    from MCTS import MCTS
+    entries = {}
+    frontier = [(np.zeros((board_size, board_size)), None)]
+    for ply in range(plies):
+        player = Config.FIRST if ply % 2 == 0 else Config.SECOND
+        next_frontier = []
+        for state, last_position in frontier:
+            key, (permutation, inverse) = position_key(state)
+            if key in entries:
+                continue
+            mcts = MCTS(new_board(state, n_in_row), think_time, simulation_times)
+            root = mcts.new_root(-1*player, last_position)
+            best_child = mcts.monte_carlo_tree_search(root)
+            x,y = best_child.position
+            entries[key] = (int(inverse[x*board_size+y]), best_child.visited_times, best_child.win_times)
+            print('Ply {} book {}: {} ({} visits)'.format(ply, len(entries), best_child.position, best_child.visited_times))
+            children = sorted(root.children, key=lambda child: child.visited_times, reverse=True)
+            for child in children[:branching]:
+                next_frontier.append((child.board.state.copy(), child.position))
+        frontier = next_frontier
+    write_book(path, board_size, board_size, n_in_row, entries)
+    return len(entries)
+
+
+class OpeningBook(object):
+    '''
+    The memory-mapped table of an opening book
+    '''
+
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=header_dtype, count=1)[0]
+        if header['magic'] != MAGIC:
+            raise ValueError('{} is not an opening book'.format(path))
+        self.height, self.width, self.n_in_row = int(header['height']), int(header['width']), int(header['n_in_row'])
+        count = int(header['count'])
+        self.keys = np.memmap(path, dtype='<u8', mode='r', offset=header_dtype.itemsize, shape=(count,))
+        self.records = np.memmap(path, dtype=record_dtype, mode='r', 
+            offset=header_dtype.itemsize+8*count, shape=(count,))
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def lookup(self, board):
+        '''
+        The book move of the board, None if the position is not in the book
+        '''
+        state = board.state
+        if state.shape != (self.height, self.width) or board.n_in_row != self.n_in_row or len(self.keys) == 0:
+            return None
+        key, (permutation, inverse) = position_key(state)
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        cell = int(permutation[self.records[index]['move']])
+        position = divmod(cell, self.width)
+        if state[position] != 0:
+            return None
+        return position
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the opening book')
+    parser.add_argument('--board_size', type=int, default=Config.board_size)
+    parser.add_argument('--n_in_row', type=int, default=Config.n_in_row)
+    parser.add_argument('--plies', type=int, default=4, help='the number of moves covered by the book')
+    parser.add_argument('--branching', type=int, default=3, help='the most visited moves followed from every position')
+    parser.add_argument('--think_time', type=float, default=3*Config.THINK_TIME)
+    parser.add_argument('--simulation_times', type=int, default=10*Config.SIMULATION_TIMES)
+    parser.add_argument('--output', default=Config.OPENING_BOOK or 'opening_book.bin')
+    args = parser.parse_args()
+
+    count = build_book(args.output, args.board_size, args.n_in_row, args.plies, args.branching, 
+        args.think_time, args.simulation_times)
+    print('{} positions written to {}'.format(count, args.output))
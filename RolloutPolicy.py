@@ -0,0 +1,59 @@
+import random
+import numpy as np
+
+import Config
+
+class RandomPolicy(object):
+    '''
+    Random positions
+    '''
+
+    def __call__(self, board, player):
+        return random.choice(board.availables)
+
+
+class ThreatPolicy(object):
+    '''
+    Win if possible, block if forced, else a random position next to a chess
+    The threats are read from the window counts of the board
+    '''
+
+    def __call__(self, board, player):
+        winning = board.winning_positions(player)
+        if winning:
+            return random.choice(winning)
+        forced = board.winning_positions(-1*player)
+        if forced:
+            return random.choice(forced)
+        if random.random() < Config.ROLLOUT_LOCAL_PROB:
+            nearest = board.nearest_positions()
+            if nearest:
+                return random.choice(nearest)
+        return random.choice(board.availables)
+
+
+class WeightedPolicy(object):
+    '''
+    Sample the empty positions with a weight growing with the chess around them
+    '''
+
+    def __call__(self, board, player):
+        counts = board.neighbour_counts()
+        empty = np.flatnonzero(board.state.ravel() == 0)
+        weights = 1 + Config.ROLLOUT_PROXIMITY_WEIGHT*counts[empty]
+        cell = empty[np.searchsorted(np.cumsum(weights), random.random()*weights.sum(), side='right')]
+        return divmod(int(cell), board.state.shape[1])
+
+
+rollout_policies = {
+    'random': RandomPolicy,
+    'threat': ThreatPolicy,
+    'weighted': WeightedPolicy,
+}
+
+
+def new_policy(name):
+    '''
+    Build the rollout policy chosen by name, see rollout_policies
+    '''
+    return rollout_policies[name]()
@@ -0,0 +1,94 @@
+import sys
+
+class SearchStats(object):
+    '''
+    Statistics of one search: where the time goes and the shape of the tree
+    The counters are updated during the search, the tree figures by finish()
+    '''
+
+    def __init__(self):
+        self.simulations = 0
+        self.elapsed_time = 0
+        self.stop_reason = None
+
+        # Seconds spent in each phase
+        self.traverse_time = 0
+        self.expand_time = 0
+        self.rollout_time = 0
+        self.backpropagate_time = 0
+
+        self.rollouts = 0
+        self.rollout_moves = 0
+
+        self.tree_size = 0
+        self.max_depth = 0
+        self.memory_bytes = 0
+        self.root_children = [] # (position, visited_times, win_times) of every root child
+
+
+    @property
+    def rollouts_per_sec(self):
+        return self.rollouts/self.elapsed_time if self.elapsed_time else 0
+
+
+    @property
+    def average_rollout_length(self):
+        return self.rollout_moves/self.rollouts if self.rollouts else 0
+
+
+    def finish(self, root, simulations, elapsed_time, stop_reason):
+        '''
+        Walk the tree once to fill the tree size, the max depth, the memory estimate and the root children
+        The boards shared by transposed nodes are counted once, the nodes without their own board have none
+        '''
+        self.simulations = simulations
+        self.elapsed_time = elapsed_time
+        self.stop_reason = stop_reason
+        self.root_children = sorted(((child.position, child.visited_times, child.win_times) for child in root.children), 
+            key=lambda x: -x[1])
+
+        boards = set()
+        self.tree_size, self.max_depth, self.memory_bytes = 0, 0, 0
+        queue = [(root, 0)]
+        while queue:
+            node, depth = queue.pop()
+            self.tree_size += 1
+            self.max_depth = max(self.max_depth, depth)
+            self.memory_bytes += sys.getsizeof(node) + sys.getsizeof(node.__dict__) + sys.getsizeof(node.children)
+            if node.materialized and id(node.board) not in boards:
+                boards.add(id(node.board))
+                self.memory_bytes += board_bytes(node.board)
+            queue.extend((child, depth+1) for child in node.children)
+        return self
+
+
+    def as_dict(self):
+        stats = dict(self.__dict__)
+        stats['rollouts_per_sec'] = self.rollouts_per_sec
+        stats['average_rollout_length'] = self.average_rollout_length
+        return stats
+
+
+    def __str__(self):
+        lines = ['Simulations: {} in {:.2f}s, stop reason: {}'.format(self.simulations, self.elapsed_time, self.stop_reason),
+            'Time: traverse {:.2f}s, expand {:.2f}s, rollout {:.2f}s, backpropagate {:.2f}s'.format(
+                self.traverse_time, self.expand_time, self.rollout_time, self.backpropagate_time),
+            'Rollouts: {:.0f}/s, {:.1f} moves on average'.format(self.rollouts_per_sec, self.average_rollout_length),
+            'Tree: {} nodes, depth {}, about {:.1f} MB'.format(self.tree_size, self.max_depth, self.memory_bytes/2**20),
+            'Root children (position, visits, wins): {}'.format(self.root_children)]
+        return '\n'.join(lines)
+
+
+def board_bytes(board):
+    '''
+    Rough memory of a board: the numpy arrays and the lists of positions
+    '''
+    size = sys.getsizeof(board) + sys.getsizeof(board.__dict__)
+    for value in board.__dict__.values():
+        if hasattr(value, 'nbytes'):
+            size += value.nbytes
+        elif isinstance(value, list) and value is not getattr(board, 'zobrist_keys', None):
+            size += sys.getsizeof(value)
+        elif isinstance(value, dict) and value is not getattr(board, 'zobrist_keys', None):
+            size += sum(getattr(array, 'nbytes', 0) for array in value.values())
+    return size
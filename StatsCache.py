@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import time
+
+from OpeningBook import position_key
+
+stats_caches = {}
+
+
+def load_cache(path, max_size):
+    '''
+    The statistics cache of the path, one connection per process
+    Return None if there is no path
+    '''
+    if not path:
+        return None
+    key = (path, os.getpid())
+    if key not in stats_caches:
+        stats_caches[key] = StatsCache(path, max_size)
+    return stats_caches[key]
+
+
+class StatsCache(object):
+    '''
+    On-disk store from the canonical key of a position to its visits and wins, shared across games and processes
+    SQLite in WAL mode, so the readers do not block the writer
+    When the store is full the least recently written positions are evicted, the least visited first,
+    read through an index, and the number of positions is kept up to date by triggers
+    '''
+
+    def __init__(self, path, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS stats (key INTEGER PRIMARY KEY, visits REAL NOT NULL, '
+                'wins REAL NOT NULL, last_used REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS stats_eviction ON stats (last_used, visits)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS stats_size (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                'count INTEGER NOT NULL)')
+            self.connection.execute('INSERT OR IGNORE INTO stats_size VALUES (0, (SELECT COUNT(*) FROM stats))')
+            self.connection.execute('CREATE TRIGGER IF NOT EXISTS stats_insert AFTER INSERT ON stats '
+                'BEGIN UPDATE stats_size SET count = count + 1; END')
+            self.connection.execute('CREATE TRIGGER IF NOT EXISTS stats_delete AFTER DELETE ON stats '
+                'BEGIN UPDATE stats_size SET count = count - 1; END')
+
+
+    @staticmethod
+    def key(state):
+        '''
+        The signed 64 bits key of the state, shared by the symmetric states
+        '''
+        key = position_key(state)[0]
+        return key - 2**64 if key >= 2**63 else key
+
+
+    def get(self, state):
+        '''
+        Return (visits, wins) of the state, or None
+        '''
+        row = self.connection.execute('SELECT visits, wins FROM stats WHERE key = ?', (self.key(state),)).fetchone()
+        if row is not None:
+            self.hits += 1
+        return row
+
+
+    def add(self, rows):
+        '''
+        Add the visits and wins of the rows [(state, visits, wins)] in one transaction, then evict
+        '''
+        if not rows:
+            return
+        now = time.time()
+        with self.connection:
+            self.connection.executemany('INSERT INTO stats (key, visits, wins, last_used) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET visits = visits + excluded.visits, wins = wins + excluded.wins, '
+                'last_used = excluded.last_used', [(self.key(state), visits, wins, now) for state, visits, wins in rows])
+            excess = len(self) - self.max_size
+            if excess > 0:
+                self.connection.execute('DELETE FROM stats WHERE key IN '
+                    '(SELECT key FROM stats ORDER BY last_used, visits LIMIT ?)', (excess,))
+
+
+    def __len__(self):
+        return self.connection.execute('SELECT count FROM stats_size').fetchone()[0]
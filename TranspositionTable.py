@@ -0,0 +1,53 @@
+import weakref
+from collections import OrderedDict
+
+class TranspositionTable(object):
+    '''
+    Bounded table from the Zobrist hash of a position to its first node
+    The nodes are held by weak references: the tree owns the nodes, the table never keeps one alive,
+    so max_size bounds the table itself and a subtree dropped from the tree is freed with its boards
+    The least recently used entry is evicted when the table is full, the dead entries when they are met
+    '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+
+
+    def get(self, key):
+        '''
+        Return the node of the key, or None
+        '''
+        node = self.peek(key)
+        if node is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return node
+
+
+    def peek(self, key):
+        '''
+        Return the node of the key, or None, without counting a hit or refreshing it
+        '''
+        reference = self.entries.get(key)
+        if reference is None:
+            return None
+        node = reference()
+        if node is None:
+            del self.entries[key]
+        return node
+
+
+    def put(self, key, node):
+        '''
+        Store the node, evict the least recently used one if the table is full
+        '''
+        self.entries[key] = weakref.ref(node)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+    def __len__(self):
+        return len(self.entries)
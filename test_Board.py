@@ -0,0 +1,113 @@
+'''
+Randomized checks of the incremental board state
+
+python -m pytest -q test_Board.py
+'''
+import random
+import numpy as np
+import pytest
+
+import Config
+from Board import Board
+from BitBoard import BitBoard
+
+
+def nearest_reference(state, radius):
+    '''
+    The empty positions within the radius of a chess, from scratch
+    '''
+    height, width = state.shape
+    positions = set()
+    for x, y in zip(*np.nonzero(state)):
+        for i in range(max(x-radius, 0), min(x+radius+1, height)):
+            for j in range(max(y-radius, 0), min(y+radius+1, width)):
+                if state[i, j] == 0:
+                    positions.add((i, j))
+    return positions
+
+
+def winning_reference(state, player):
+    '''
+    The positions where the player wins at once, by playing every empty position
+    '''
+    positions = set()
+    for position in zip(*np.nonzero(state == 0)):
+        board = Board(state.copy(), 5)
+        board.move(position, player)
+        if board.winner == player:
+            positions.add((int(position[0]), int(position[1])))
+    return positions
+
+
+def assert_equivalent(board, bitboard, radius, threats=False):
+    '''
+    The incremental state of both engines matches a board rebuilt from the state
+    threats: also check the winning positions, slow
+    '''
+    state = board.state
+    fresh = Board(state.copy(), board.n_in_row)
+    assert np.array_equal(bitboard.state, state)
+    assert set(board.availables) == set(bitboard.availables) == set(fresh.availables)
+    assert board.check_game_result() == bitboard.check_game_result() == fresh.check_game_result()
+    assert board.zobrist == bitboard.zobrist == fresh.zobrist
+    assert np.array_equal(board.neighbour_counts(), fresh.neighbour_counts())
+    assert np.array_equal(bitboard.neighbour_counts(), fresh.neighbour_counts())
+    nearest = nearest_reference(state, radius)
+    assert set(board.nearest_positions()) == set(bitboard.nearest_positions()) == nearest
+    if threats and not board.is_over:
+        for player in (1, -1):
+            winning = winning_reference(state, player)
+            assert set(board.winning_positions(player)) == set(bitboard.winning_positions(player)) == winning
+
+
+@pytest.mark.parametrize('board_size', [8, 15])
+@pytest.mark.parametrize('radius', [1, 2])
+def test_move_undo_copy_sequences(monkeypatch, board_size, radius):
+    '''
+    Random sequences of moves, undos and copies keep Board and BitBoard equal to a board built from scratch
+    '''
+    monkeypatch.setattr(Config, 'CANDIDATE_RADIUS', radius)
+    rng = random.Random(board_size*10 + radius)
+    for game in range(20):
+        board = Board(np.zeros((board_size, board_size)), 5)
+        bitboard = BitBoard(np.zeros((board_size, board_size)), 5)
+        player = Config.FIRST
+        for step in range(rng.randint(5, 60)):
+            action = rng.random()
+            if action < 0.2 and board.history:
+                board.undo_move()
+                bitboard.undo_move()
+                player = -1*player
+            elif action < 0.3:
+                board, bitboard = board.copy(), bitboard.copy()
+            elif not board.is_over and board.availables:
+                position = rng.choice(board.availables)
+                assert board.move(position, player)
+                assert bitboard.move(position, player)
+                player = -1*player
+            if rng.random() < 0.3:
+                assert_equivalent(board, bitboard, radius)
+        assert_equivalent(board, bitboard, radius, threats=True)
+
+
+def test_undo_restores_the_index():
+    '''
+    Undoing a whole game, with the index synced in between, gives back the empty board
+    '''
+    rng = random.Random(0)
+    board = Board(np.zeros((8, 8)), 5)
+    empty = Board(np.zeros((8, 8)), 5)
+    player = Config.FIRST
+    while not board.is_over:
+        board.move(rng.choice(board.availables), player)
+        if rng.random() < 0.5:
+            board.nearest_positions()
+        player = -1*player
+    while board.history:
+        board.undo_move()
+        if rng.random() < 0.5:
+            board.nearest_positions()
+    assert board.zobrist == empty.zobrist
+    assert board.check_game_result() == (False, None)
+    assert np.array_equal(board.neighbour_counts(), empty.neighbour_counts())
+    assert board.nearest_positions() == []
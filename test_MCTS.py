@@ -0,0 +1,109 @@
+'''
+Checks of the search modes
+
+python -m pytest -q test_MCTS.py
+'''
+import contextlib
+import os
+import threading
+import pytest
+
+import Config
+import MCTS as search
+from Benchmark import seeded_positions, tactical_positions
+
+
+@pytest.fixture
+def thread_errors(monkeypatch):
+    '''
+    The exceptions raised in the worker threads, which would otherwise only be printed
+    '''
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook', lambda args: errors.append(args.exc_value))
+    return errors
+
+
+def choose(board, player, think_time):
+    '''
+    The position chosen by a fresh search, its output silenced
+    '''
+    mcts = search.MCTS(board, think_time, float('inf'))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        position = mcts.choose_position(player, board.last_position)
+    return position, mcts
+
+
+def test_tree_parallel_search_on_tactical_positions(monkeypatch, thread_errors):
+    '''
+    The tree-parallel workers survive the solver proving nodes under them, and take the immediate wins
+    '''
+    monkeypatch.setattr(Config, 'SEARCH_MODE', 'tree')
+    monkeypatch.setattr(Config, 'SOLVER', True)
+    monkeypatch.setattr(Config, 'OPENING_BOOK', None)
+    monkeypatch.setattr(search, 'max_workers', 8)
+    for board, player in tactical_positions(8, 5, 10, seed=1):
+        position, mcts = choose(board, player, 0.3)
+        assert position in board.winning_positions(-1*player)
+    for board, player in seeded_positions(8, 5, 30, 20, seed=2):
+        position, mcts = choose(board, player, 0.3)
+        assert position in board.availables
+    assert thread_errors == []
+
+
+def test_root_parallel_search_plays_the_proven_wins(monkeypatch):
+    '''
+    The merge of the root-parallel workers plays the immediate wins and records why it stopped
+    '''
+    monkeypatch.setattr(Config, 'SEARCH_MODE', 'root')
+    monkeypatch.setattr(Config, 'SOLVER', True)
+    monkeypatch.setattr(Config, 'OPENING_BOOK', None)
+    monkeypatch.setattr(search, 'max_workers', 2)
+    for board, player in tactical_positions(8, 5, 3, seed=3):
+        position, mcts = choose(board, player, 0.5)
+        assert position in board.winning_positions(-1*player)
+        assert mcts.stop_reason == 'proven win'
+    board, player = seeded_positions(8, 5, 1, 10, seed=4)[0]
+    position, mcts = choose(board, player, 0.5)
+    assert position in board.availables
+    assert mcts.stop_reason is not None
+
+
+def test_root_parallel_search_cancelled(monkeypatch):
+    '''
+    Setting the cancel event stops the root-parallel search without waiting for the workers,
+    and the next decision does not keep the stale reason
+    '''
+    monkeypatch.setattr(Config, 'SEARCH_MODE', 'root')
+    monkeypatch.setattr(Config, 'OPENING_BOOK', None)
+    monkeypatch.setattr(search, 'max_workers', 2)
+    board, player = seeded_positions(8, 5, 1, 10, seed=5)[0]
+    mcts = search.MCTS(board, 5, float('inf'))
+    mcts.cancel = threading.Event()
+    threading.Timer(0.2, mcts.cancel.set).start()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        assert mcts.choose_position(player, board.last_position) is None
+    assert mcts.stop_reason == 'cancelled'
+    assert search.time.perf_counter() - mcts.begin_time < 2
+    # The single move left is answered at once, and the reason of the cancelled search is gone
+    mcts.cancel.clear()
+    mcts.board.availables = mcts.board.availables[:1]
+    assert mcts.choose_position(player, board.last_position) == mcts.board.availables[0]
+    assert mcts.stop_reason is None
+
+
+def test_ponder_keeps_the_finished_stats(monkeypatch):
+    '''
+    Pondering after a decision leaves the statistics of that decision untouched
+    '''
+    monkeypatch.setattr(Config, 'SEARCH_MODE', 'serial')
+    monkeypatch.setattr(Config, 'OPENING_BOOK', None)
+    monkeypatch.setattr(Config, 'REUSE_TREE', True)
+    monkeypatch.setattr(Config, 'PONDER_SIMULATIONS', 200)
+    board, player = seeded_positions(8, 5, 1, 10, seed=6)[0]
+    position, mcts = choose(board, player, 0.2)
+    stats = mcts.stats
+    finished = dict(vars(stats))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        assert mcts.ponder(lambda: False) > 0
+    assert mcts.stats is stats
+    assert vars(stats) == finished